@@ -0,0 +1,152 @@
+from interpreter import Interpreter, COMPARISONS
+from parser import AST, Input
+from inputs import parse_input
+from sinks import DEFAULT_BUFFER_SIZE
+
+def input_paths(ast):
+    # The set of nodes that have an Input somewhere below them, found in one
+    # post-order pass
+    found = set()
+    stack = [(ast, False)]
+    while stack:
+        node, visited = stack.pop()
+        children = []
+        for field in type(node).__slots__:
+            child = getattr(node, field, None)
+            if isinstance(child, list):
+                children.extend(child)
+            elif isinstance(child, AST):
+                children.append(child)
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+        elif isinstance(node, Input) or any(child in found for child in children):
+            found.add(node)
+    return found
+
+class AsyncStreamSink:
+    # Buffers output lines and hands them to an asyncio StreamWriter;
+    # drain() also waits for the transport to catch up
+    def __init__(self, writer, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.writer = writer
+        self.buffer_size = buffer_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, value):
+        text = f'{value}\n'
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def write_text(self, text):
+        self.flush()
+        self.writer.write(text.encode('utf-8'))
+
+    def flush(self):
+        if self.parts:
+            self.writer.write(''.join(self.parts).encode('utf-8'))
+            self.parts = []
+            self.size = 0
+
+    async def drain(self):
+        self.flush()
+        await self.writer.drain()
+
+    def close(self):
+        self.flush()
+
+class AsyncStreamInput:
+    # Reads one value per line from an asyncio StreamReader, optionally
+    # sending the usual prompt first
+    def __init__(self, reader, output, prompt=True):
+        self.reader = reader
+        self.output = output
+        self.prompt = prompt
+
+    async def read(self, name):
+        if self.prompt:
+            self.output.write_text(f"Input value for {name}: ")
+        # Pending output has to reach the client before we wait on it
+        await self.output.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise Exception(f'Runtime Error: No input left for "{name}"')
+        return parse_input(line.decode('utf-8', 'replace').rstrip('\r\n'))
+
+class AsyncInterpreter(Interpreter):
+    # Tree-walking interpreter whose input waits on the event loop instead
+    # of blocking the thread. Only the statements that can reach an input
+    # are walked as coroutines; everything else runs through the normal
+    # synchronous visitors
+    def __init__(self, ast, output, inputs):
+        super().__init__(ast, output, inputs)
+        self.awaits = input_paths(ast)
+
+    async def run(self):
+        try:
+            return await self.visit_async(self.ast)
+        finally:
+            await self.output.drain()
+
+    async def visit_async(self, node):
+        if node not in self.awaits:
+            return self.visit(node)
+        method_name = f'visit_async_{type(node).__name__}'
+        visitor = getattr(self, method_name)
+        return await visitor(node)
+
+    async def visit_async_Statement(self, node):
+        for statement in node.statements:
+            await self.visit_async(statement)
+
+    async def visit_async_Input(self, node):
+        return await self.inputs.read(node.var_name)
+
+    async def visit_async_Assign(self, node):
+        self.values[node.slot] = await self.visit_async(node.value)
+
+    async def visit_async_BinOp(self, node):
+        left = await self.visit_async(node.left)
+        right = await self.visit_async(node.right)
+        return self.operate(node.op, left, right)
+
+    async def visit_async_Else(self, node):
+        await self.visit_async(node.body)
+
+    async def visit_async_IfBlock(self, node):
+        if self.visit(node.condition):
+            await self.visit_async(node.body)
+        elif node.else_body:
+            await self.visit_async(node.else_body)
+
+    async def visit_async_ForBlock(self, node):
+        count = self.visit(node.count)
+        for _ in range(int(count)):
+            await self.visit_async(node.body)
+
+    async def visit_async_WhileBlock(self, node):
+        left = self.visit(node.left)
+        compare = COMPARISONS[node.op]
+        right = self.visit(node.right)
+        if node.invariant:
+            if compare(left, right):
+                return
+            while True:
+                await self.visit_async(node.body)
+        while not compare(left, right):
+            await self.visit_async(node.body)
+            left = self.visit(node.left)
+            right = self.visit(node.right)
+
+async def run_session(ast, reader, writer, prompt=True, buffer_size=DEFAULT_BUFFER_SIZE):
+    # Runs one program for one connection; errors are reported to the
+    # client the same way main.py reports them
+    output = AsyncStreamSink(writer, buffer_size)
+    interpreter = AsyncInterpreter(ast, output, AsyncStreamInput(reader, output, prompt))
+    try:
+        await interpreter.run()
+    except Exception as e:
+        output.write(f"Error processing file: {str(e)}")
+        await output.drain()
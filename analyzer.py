@@ -0,0 +1,336 @@
+from resolver import UNDEFINED
+from lists import NumberList
+from parser import (Statement, BinOp, Assign, Number, String, Variable, ListLiteral, Range, Index, Length,
+                    Print, If, Else, IfBlock, ForBlock, WhileBlock)
+
+# Kinds of value an expression can produce, as bits of a mask. OTHER stands
+# for anything the analysis cannot vouch for, such as values that embedders
+# set or custom input providers return
+NUMBER = 1
+STRING = 2
+LIST = 4
+OTHER = 8
+ANY = NUMBER | STRING | LIST | OTHER
+
+KIND_NAMES = ((NUMBER, 'number'), (STRING, 'string'), (LIST, 'list'))
+
+def kind_of(value):
+    if type(value) is float:
+        return NUMBER
+    if type(value) is str:
+        return STRING
+    if type(value) is NumberList:
+        return LIST
+    return OTHER
+
+def describe(mask):
+    return ' or '.join(name for kind, name in KIND_NAMES if mask & kind)
+
+# (op, left mask, right mask) -> (result mask, some pair fails, some pair works)
+COMBINATIONS = {}
+
+def combine(op, left, right):
+    key = (op, left, right)
+    if key not in COMBINATIONS:
+        result = 0
+        fails = works = False
+        for left_kind in (NUMBER, STRING, LIST, OTHER):
+            if not left & left_kind:
+                continue
+            for right_kind in (NUMBER, STRING, LIST, OTHER):
+                if not right & right_kind:
+                    continue
+                if OTHER in (left_kind, right_kind):
+                    result |= OTHER
+                    fails = works = True
+                elif STRING not in (left_kind, right_kind):
+                    # Numbers and lists mix freely, giving a list if either is one
+                    result |= left_kind | right_kind
+                    works = True
+                elif left_kind == right_kind and op == '+':
+                    result |= STRING
+                    works = True
+                else:
+                    fails = True
+        COMBINATIONS[key] = result, fails, works
+    return COMBINATIONS[key]
+
+class Problem:
+    # An error the program is certain to stop with if the line runs
+    __slots__ = ('message', 'line', 'column')
+
+    def __init__(self, message, node):
+        self.message = message
+        self.line = getattr(node, 'line', None)
+        self.column = getattr(node, 'column', None)
+
+    def __str__(self):
+        if self.line is None:
+            return self.message
+        return f'{self.message} at line {self.line}, column {self.column}'
+
+    def __repr__(self):
+        return f'Problem({str(self)!r})'
+
+class Analyzer:
+    # Def-use and type analysis over a resolved tree. Every Variable gets
+    # `checked` cleared where the variable is defined on every path that
+    # reaches it, and every BinOp where its operand kinds always work and a
+    # divisor cannot be a zero number; engines skip those checks for such
+    # nodes. Errors certain to happen when their line runs are returned.
+    # Variables already set in `slots` count as defined, so the analysis
+    # also fits statements run on top of earlier ones
+    def __init__(self, slots):
+        self.slots = slots
+        self.values = slots.values
+        # Slots defined on every path to the current node, and the order
+        # they were added in, so a branch can take its additions back out
+        self.defined = set()
+        self.added = []
+        # Kinds each slot may hold, from its values so far and from every
+        # assignment to it
+        self.kinds = {}
+        self.assignments = set()
+        # Operations and list uses with the shapes of their operands,
+        # checked once the kinds are known
+        self.operations = []
+        self.outcomes = {}
+        # Reads that may come before any assignment: the Variable, and a
+        # one-item list holding the position no assignment may come before
+        # for the read to certainly fail
+        self.reads = []
+        self.first_assigned = {}
+        self.position = 0
+        self.loop_end = None
+        self.flows = {
+            Statement: self.flow_Statement,
+            Else: self.flow_Else,
+            IfBlock: self.flow_IfBlock,
+            ForBlock: self.flow_ForBlock,
+            WhileBlock: self.flow_WhileBlock,
+        }
+
+    def analyze(self, ast):
+        self.walk(ast)
+        self.infer_kinds()
+        problems = self.undefined_reads()
+        for node, first, second in self.operations:
+            if type(node) is BinOp:
+                self.annotate(node, first, second, problems)
+            else:
+                self.check_list_use(node, first, problems)
+        problems.sort(key=lambda problem: (problem.line or 0, problem.column or 0))
+        return problems
+
+    def walk(self, node):
+        # Visits the tree in the order it runs, with an explicit stack of
+        # block generators like Interpreter.run_block
+        flows = self.flows
+        flow = flows.get(type(node))
+        if flow is None:
+            self.statement(node)
+            return
+        stack = [flow(node)]
+        while stack:
+            for child in stack[-1]:
+                flow = flows.get(type(child))
+                if flow is None:
+                    self.statement(child)
+                else:
+                    stack.append(flow(child))
+                    break
+            else:
+                stack.pop()
+
+    def mark(self):
+        return len(self.added)
+
+    def undo(self, mark):
+        # Forgets the slots defined since `mark` and returns them
+        removed = set(self.added[mark:])
+        self.defined.difference_update(removed)
+        del self.added[mark:]
+        return removed
+
+    def define(self, slots):
+        for slot in slots:
+            if slot not in self.defined:
+                self.defined.add(slot)
+                self.added.append(slot)
+
+    def enter_loop(self):
+        # Reads in a loop may follow assignments further down its body on a
+        # later pass, so only the outermost loop's end bounds them
+        outer = self.loop_end
+        if outer is None:
+            self.loop_end = [None]
+        return outer
+
+    def leave_loop(self, outer):
+        if outer is None:
+            self.loop_end[0] = self.position
+        self.loop_end = outer
+
+    def flow_Statement(self, node):
+        return iter(node.statements)
+
+    def flow_Else(self, node):
+        yield node.body
+
+    def flow_IfBlock(self, node):
+        self.expression(node.condition)
+        mark = self.mark()
+        yield node.body
+        taken = self.undo(mark)
+        if node.else_body:
+            yield node.else_body
+            # Defined after the block when both branches define it
+            self.define(taken & self.undo(mark))
+
+    def flow_ForBlock(self, node):
+        self.expression(node.count)
+        mark = self.mark()
+        outer = self.enter_loop()
+        yield node.body
+        self.leave_loop(outer)
+        # The body may not run at all
+        self.undo(mark)
+
+    def flow_WhileBlock(self, node):
+        # Later checks of the condition see at least these definitions
+        self.expression(node.left)
+        self.expression(node.right)
+        mark = self.mark()
+        outer = self.enter_loop()
+        yield node.body
+        self.leave_loop(outer)
+        self.undo(mark)
+
+    def statement(self, node):
+        if isinstance(node, Assign):
+            shape = self.expression(node.value)
+            self.position += 1
+            self.assignments.add((node.slot, shape))
+            self.first_assigned.setdefault(node.slot, self.position)
+            self.define((node.slot,))
+        elif isinstance(node, Print):
+            self.expression(node.value)
+        else:
+            self.expression(node)
+
+    def expression(self, node):
+        # Annotates the reads in the expression and returns its shape: a
+        # kind mask, a (slot,) tuple for a defined variable, or (op, left,
+        # right) for an operation. Kinds are worked out per shape, so the
+        # many statements of a long script that look alike are inferred once
+        self.position += 1
+        node_type = type(node)
+        if node_type is Variable:
+            slot = node.slot
+            if slot in self.defined:
+                node.checked = False
+            elif self.values[slot] is not UNDEFINED:
+                # Set before this analysis, by earlier statements
+                node.checked = False
+                self.kinds[slot] = self.kinds.get(slot, 0) | kind_of(self.values[slot])
+            else:
+                node.checked = True
+                self.reads.append((node, self.loop_end or [self.position]))
+                return OTHER
+            return (slot,)
+        if node_type is Number:
+            return kind_of(node.value)
+        if node_type is String:
+            return STRING
+        if node_type is BinOp:
+            left = self.expression(node.left)
+            right = self.expression(node.right)
+            self.operations.append((node, left, right))
+            return (node.op, left, right)
+        if node_type is If:
+            self.expression(node.left)
+            self.expression(node.right)
+        elif node_type is ListLiteral:
+            shapes = tuple(self.expression(element) for element in node.elements)
+            self.operations.append((node, shapes, None))
+            return LIST
+        elif node_type is Range:
+            self.expression(node.start)
+            self.expression(node.end)
+            return LIST
+        elif node_type is Index:
+            value = self.expression(node.value)
+            self.expression(node.index)
+            self.operations.append((node, value, None))
+            return NUMBER
+        elif node_type is Length:
+            self.operations.append((node, self.expression(node.value), None))
+            return NUMBER
+        return ANY
+
+    def kind(self, shape):
+        # Kinds a shape can evaluate to, given what is known so far
+        if type(shape) is int:
+            return shape
+        if len(shape) == 1:
+            return self.kinds.get(shape[0], 0)
+        op, left, right = shape
+        return combine(op, self.kind(left), self.kind(right))[0]
+
+    def infer_kinds(self):
+        # Repeats until no slot gains a kind, since an assignment can
+        # depend on one further down, for example in a loop
+        kinds = self.kinds
+        changed = True
+        while changed:
+            changed = False
+            for slot, shape in self.assignments:
+                known = kinds.get(slot, 0)
+                kind = known | self.kind(shape)
+                if kind != known:
+                    kinds[slot] = kind
+                    changed = True
+
+    def undefined_reads(self):
+        # A read fails for certain when no assignment to its variable comes
+        # before it, counting the whole of any loop around it
+        problems = []
+        first_assigned = self.first_assigned
+        for node, end in self.reads:
+            first = first_assigned.get(node.slot)
+            if first is None or first >= end[0]:
+                problems.append(Problem(f'Variable "{node.name}" is not defined', node))
+        return problems
+
+    def annotate(self, node, left, right, problems):
+        key = (node.op, left, right)
+        if key not in self.outcomes:
+            left_kind = self.kind(left)
+            right_kind = self.kind(right)
+            self.outcomes[key] = (left_kind, right_kind) + combine(node.op, left_kind, right_kind)[1:]
+        left, right, fails, works = self.outcomes[key]
+        divisor = node.right
+        literal = type(divisor) is Number and kind_of(divisor.value) == NUMBER
+        zero_divisor = node.op == '/' and left & NUMBER and right & NUMBER and not (literal and divisor.value != 0)
+        node.checked = fails or zero_divisor
+        if not left or not right:
+            # An operand that never has a value fails on its own
+            return
+        if node.op == '/' and literal and divisor.value == 0:
+            problems.append(Problem('Division by zero', node))
+        elif fails and not works:
+            problems.append(Problem(f'Invalid operation {describe(left)} {node.op} {describe(right)}', node))
+
+    def check_list_use(self, node, shape, problems):
+        node_type = type(node)
+        if node_type is ListLiteral:
+            for element, element_shape in zip(node.elements, shape):
+                kind = self.kind(element_shape)
+                if kind and not kind & (NUMBER | OTHER):
+                    problems.append(Problem(f'Lists can only hold numbers, not a {describe(kind)}', element))
+            return
+        kind = self.kind(shape)
+        if node_type is Index and kind and not kind & (LIST | OTHER):
+            problems.append(Problem(f'Can only index lists, not a {describe(kind)}', node))
+        elif node_type is Length and kind and not kind & (LIST | STRING | OTHER):
+            problems.append(Problem(f'Can only take the length of a list or string, not a {describe(kind)}', node))
@@ -0,0 +1,122 @@
+import os
+import sys
+import glob
+import json
+import time
+import signal
+from concurrent.futures import ProcessPoolExecutor
+
+class ProgramTimeout(BaseException):
+    # Derives from BaseException so nothing inside the engines swallows it
+    pass
+
+def find_programs(targets, manifest=None):
+    # Expands directories, glob patterns and manifest entries into a
+    # sorted, duplicate-free list of .enl files per target. Patterns also
+    # match compiled .enlf files; directories, which usually hold both,
+    # give only the sources
+    targets = list(targets)
+    if manifest is not None:
+        # One path or pattern per line, relative to the manifest
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    targets.append(os.path.join(base, line))
+
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            paths.extend(sorted(glob.glob(os.path.join(target, '**', '*.enl'), recursive=True)))
+        elif glob.has_magic(target):
+            paths.extend(sorted(path for path in glob.glob(target, recursive=True) if path.endswith(('.enl', '.enlf'))))
+        else:
+            paths.append(target)
+
+    seen = set()
+    programs = []
+    for path in paths:
+        if path not in seen:
+            seen.add(path)
+            programs.append(path)
+    return programs
+
+def on_timeout(signum, frame):
+    raise ProgramTimeout
+
+def run_job(job):
+    # Runs one program in a worker process and reports what happened
+    path, options = job
+    # Imported here so main.py can import this module without a cycle
+    from main import run_program, run_compiled, COMPILED_EXTENSION
+    from cache import ProgramCache
+    from sinks import ListSink
+    from inputs import FileInput, IterableInput
+
+    output = ListSink()
+    result = {'path': path, 'status': 'ok', 'output': '', 'error': None}
+    timeout = options['timeout']
+    timer = timeout and hasattr(signal, 'setitimer')
+    start = time.perf_counter()
+    try:
+        compiled = path.endswith(COMPILED_EXTENSION)
+        if not path.endswith('.enl') and not compiled:
+            raise Exception(f'File must have .enl or {COMPILED_EXTENSION} extension')
+        if not compiled:
+            with open(path, 'r') as file:
+                content = file.read()
+        if isinstance(options['inputs'], list):
+            # Values read from stdin once by the parent
+            inputs = IterableInput(options['inputs'])
+        elif options['inputs'] is not None:
+            inputs = FileInput(options['inputs'])
+        else:
+            inputs = IterableInput(())
+        if compiled or options['no_cache']:
+            cache = None
+        elif options['cache_dir']:
+            cache = ProgramCache(options['cache_dir'], options['cache_size'])
+        else:
+            cache = ProgramCache.for_script(path, options['cache_size'])
+        if timer:
+            signal.signal(signal.SIGALRM, on_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            if compiled:
+                # Memory-mapped, so workers running the same file share its pages
+                run_compiled(path, output, inputs)
+            else:
+                run_program(content, engine=options['engine'], cache=cache,
+                            optimize=options['optimize'], output=output, inputs=inputs)
+        finally:
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except ProgramTimeout:
+        result['status'] = 'timeout'
+        result['error'] = f'Timed out after {timeout} seconds'
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    result['wall_time'] = round(time.perf_counter() - start, 6)
+    result['output'] = output.getvalue()
+    return result
+
+def run_batch(programs, options, jobs=None, summary=None):
+    # Runs every program across a process pool and writes one JSON line
+    # per program, in input order; returns the number that did not succeed
+    jobs = jobs or os.cpu_count() or 1
+    work = [(path, options) for path in programs]
+    chunksize = max(1, min(64, len(work) // (jobs * 4)))
+    failures = 0
+    file = open(summary, 'w') if summary else sys.stdout
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for result in executor.map(run_job, work, chunksize=chunksize):
+                if result['status'] != 'ok':
+                    failures += 1
+                file.write(json.dumps(result) + '\n')
+    finally:
+        if file is not sys.stdout:
+            file.close()
+    return failures
@@ -0,0 +1,2 @@
+from benchmarks.workloads import WORKLOADS, generate
+from benchmarks.runner import run_benchmarks, compare, measurements
@@ -0,0 +1,89 @@
+import sys
+import json
+import argparse
+from main import ENGINES
+from benchmarks.workloads import WORKLOADS, generate
+from benchmarks.runner import run_benchmarks, format_results, mismatches, compare, format_comparison
+
+def parse_args(argv):
+    arg_parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='time every phase of the workloads on every engine')
+    run.add_argument('--workload', action='append', dest='workloads', choices=sorted(WORKLOADS),
+                     help='workload to run; repeat for several (default: all)')
+    run.add_argument('--engine', action='append', dest='engines', choices=sorted(ENGINES),
+                     help='engine to run; repeat for several (default: all)')
+    run.add_argument('--size', type=int,
+                     help='size of every workload instead of its default')
+    run.add_argument('--scale', type=float, default=1.0,
+                     help='multiply the default workload sizes by this factor (default: 1.0)')
+    run.add_argument('--repeat', type=int, default=3,
+                     help='runs of each phase; the best time is kept (default: 3)')
+    run.add_argument('-O', '--optimize', action='store_true',
+                     help='also time the optimizer and run the engines on its output')
+    run.add_argument('--no-memory', action='store_true',
+                     help='skip the extra runs that measure peak memory with tracemalloc')
+    run.add_argument('--output', metavar='FILE',
+                     help='write the results as JSON to FILE')
+
+    diff = commands.add_parser('compare', help='compare two JSON results and flag regressions')
+    diff.add_argument('base')
+    diff.add_argument('new')
+    diff.add_argument('--threshold', type=float, default=0.1,
+                      help='relative growth that counts as a regression (default: 0.1)')
+    diff.add_argument('--min-time', type=float, default=0.001,
+                      help='ignore time differences below this many seconds (default: 0.001)')
+
+    show = commands.add_parser('generate', help='print the source of a workload')
+    show.add_argument('workload', choices=sorted(WORKLOADS))
+    show.add_argument('--size', type=int)
+    show.add_argument('--scale', type=float, default=1.0)
+
+    args = arg_parser.parse_args(argv)
+    if args.command == 'run' and args.repeat < 1:
+        arg_parser.error('--repeat must be at least 1')
+    return args
+
+def main_run(args):
+    progress = lambda name: print(f"Running {name}...", file=sys.stderr)
+    results = run_benchmarks(args.workloads, args.engines, args.size, args.scale, args.repeat,
+                             args.optimize, not args.no_memory, progress)
+    print(format_results(results), end='')
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+            file.write('\n')
+    differing = mismatches(results)
+    if differing:
+        for name, engine in differing:
+            print(f"Error: {engine} output differs from {next(iter(results['workloads'][name]['engines']))} on {name}")
+        sys.exit(1)
+
+def main_compare(args):
+    try:
+        with open(args.base, 'r') as file:
+            base = json.load(file)
+        with open(args.new, 'r') as file:
+            new = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    rows = compare(base, new, args.threshold, args.min_time)
+    print(format_comparison(rows, base, new), end='')
+    regressions = sum(1 for row in rows if row[4])
+    if regressions:
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.command == 'run':
+        main_run(args)
+    elif args.command == 'compare':
+        main_compare(args)
+    else:
+        print(generate(args.workload, args.size, args.scale)[0], end='')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import sys
+import time
+import platform
+import subprocess
+import tracemalloc
+from lexer import Lexer
+from parser import Parser
+from optimizer import Optimizer
+from main import ENGINES
+from sinks import ListSink
+from inputs import IterableInput
+from benchmarks.workloads import WORKLOADS, generate
+
+def timed(function, repeat):
+    # Best and mean wall time of `repeat` calls, and the last result
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'mean': sum(times) / len(times)}, result
+
+def peak_memory(function):
+    # Peak bytes allocated while `function` runs
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_engine(engine, ast):
+    # Builds and runs one engine on `ast`, capturing its output
+    output = ListSink()
+    interpreter = ENGINES[engine](ast, output, IterableInput(()))
+    error = None
+    try:
+        interpreter.interpret()
+    except Exception as e:
+        error = str(e)
+    return output.lines, error
+
+def bench_engine(engine, ast, repeat, memory):
+    # The engine is built afresh for every run, so setup covers compiling
+    # and interpret covers only running the program
+    def setup():
+        return ENGINES[engine](ast, ListSink(), IterableInput(()))
+
+    setup_time, _ = timed(setup, repeat)
+    times = []
+    lines, error = None, None
+    for _ in range(repeat):
+        output = ListSink()
+        interpreter = ENGINES[engine](ast, output, IterableInput(()))
+        start = time.perf_counter()
+        try:
+            interpreter.interpret()
+            error = None
+        except Exception as e:
+            error = str(e)
+        times.append(time.perf_counter() - start)
+        lines = output.lines
+    result = {
+        'phases': {
+            'setup': setup_time,
+            'interpret': {'best': min(times), 'mean': sum(times) / len(times)},
+        },
+        'output_lines': len(lines),
+        'error': error,
+    }
+    if memory:
+        result['memory'] = {
+            'setup': peak_memory(setup),
+            'interpret': peak_memory(lambda: run_engine(engine, ast)),
+        }
+    return result, (lines, error)
+
+def bench_workload(name, engines, size=None, scale=1.0, repeat=3, optimize=False, memory=True):
+    source, size = generate(name, size, scale)
+    phases = {}
+    phases['lex'], tokens = timed(lambda: Lexer(source).tokenize(), repeat)
+    phases['parse'], ast = timed(lambda: Parser(tokens).parse(), repeat)
+    if optimize:
+        phases['optimize'], ast = timed(lambda: Optimizer().optimize(ast), repeat)
+
+    result = {
+        'size': size,
+        'lines': source.count('\n'),
+        'tokens': len(tokens),
+        'phases': phases,
+        'engines': {},
+    }
+    if memory:
+        result['memory'] = {
+            'lex': peak_memory(lambda: Lexer(source).tokenize()),
+            'parse': peak_memory(lambda: Parser(tokens).parse()),
+        }
+        if optimize:
+            result['memory']['optimize'] = peak_memory(lambda: Optimizer().optimize(ast))
+
+    # Every engine must produce the same output and error as the first one
+    reference = None
+    for engine in engines:
+        engine_result, outcome = bench_engine(engine, ast, repeat, memory)
+        if reference is None:
+            reference = outcome
+        engine_result['agrees'] = outcome == reference
+        result['engines'][engine] = engine_result
+    return result
+
+def current_commit():
+    try:
+        completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                   text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if completed.returncode != 0:
+        return None
+    return completed.stdout.strip()
+
+def run_benchmarks(workloads=None, engines=None, size=None, scale=1.0, repeat=3, optimize=False,
+                   memory=True, progress=None):
+    workloads = list(workloads or WORKLOADS)
+    engines = list(engines or ENGINES)
+    results = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'implementation': sys.implementation.name,
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'scale': scale,
+        'optimize': optimize,
+        'workloads': {},
+    }
+    for name in workloads:
+        if progress is not None:
+            progress(name)
+        results['workloads'][name] = bench_workload(name, engines, size, scale, repeat, optimize, memory)
+    return results
+
+def measurements(results):
+    # Flattens results into {(workload, engine or None, phase, kind): value}
+    # where kind is "time" (best seconds) or "memory" (peak bytes)
+    flat = {}
+    for name, workload in results['workloads'].items():
+        for phase, times in workload['phases'].items():
+            flat[name, None, phase, 'time'] = times['best']
+        for phase, peak in workload.get('memory', {}).items():
+            flat[name, None, phase, 'memory'] = peak
+        for engine, engine_result in workload['engines'].items():
+            for phase, times in engine_result['phases'].items():
+                flat[name, engine, phase, 'time'] = times['best']
+            for phase, peak in engine_result.get('memory', {}).items():
+                flat[name, engine, phase, 'memory'] = peak
+    return flat
+
+def format_value(value, kind):
+    if kind == 'time':
+        return f'{value * 1000:.2f}ms'
+    return f'{value / 1024:.0f}KiB'
+
+def format_results(results):
+    lines = [f"commit {results['commit'] or '?'}, Python {results['python']}, best of {results['repeat']}"]
+    for name, workload in results['workloads'].items():
+        lines.append('')
+        lines.append(f"{name}: size {workload['size']}, {workload['lines']} lines, {workload['tokens']} tokens")
+        memory = workload.get('memory', {})
+        for phase, times in workload['phases'].items():
+            peak = f"  peak {format_value(memory[phase], 'memory')}" if phase in memory else ''
+            lines.append(f"  {phase:<20} {format_value(times['best'], 'time'):>12}{peak}")
+        for engine, engine_result in workload['engines'].items():
+            memory = engine_result.get('memory', {})
+            for phase, times in engine_result['phases'].items():
+                peak = f"  peak {format_value(memory[phase], 'memory')}" if phase in memory else ''
+                lines.append(f"  {engine + ' ' + phase:<20} {format_value(times['best'], 'time'):>12}{peak}")
+            status = 'agrees' if engine_result['agrees'] else 'OUTPUT DIFFERS'
+            error = f", error: {engine_result['error']}" if engine_result['error'] else ''
+            lines.append(f"  {engine + ' output':<20} {engine_result['output_lines']:>10} lines, {status}{error}")
+    return '\n'.join(lines) + '\n'
+
+def mismatches(results):
+    return [(name, engine) for name, workload in results['workloads'].items()
+            for engine, engine_result in workload['engines'].items() if not engine_result['agrees']]
+
+def compare(base, new, threshold=0.1, min_time=0.001):
+    # Rows of (key, base value, new value, ratio, regressed) for every
+    # measurement in both results. A time regresses when it grew by more
+    # than `threshold` and by more than `min_time` seconds, which keeps
+    # timer noise on tiny phases from being flagged
+    base_values = measurements(base)
+    new_values = measurements(new)
+    rows = []
+    for key, new_value in new_values.items():
+        if key not in base_values:
+            continue
+        base_value = base_values[key]
+        ratio = new_value / base_value if base_value else float('inf') if new_value else 1.0
+        regressed = ratio > 1 + threshold
+        if key[3] == 'time' and new_value - base_value < min_time:
+            regressed = False
+        rows.append((key, base_value, new_value, ratio, regressed))
+    return rows
+
+def format_comparison(rows, base, new):
+    lines = [f"base {base['commit'] or '?'} -> new {new['commit'] or '?'}"]
+    for (name, engine, phase, kind), base_value, new_value, ratio, regressed in rows:
+        label = '/'.join(part for part in (name, engine, phase) if part)
+        if kind == 'memory':
+            label += ' (peak)'
+        flag = '  REGRESSION' if regressed else ''
+        lines.append(f'  {label:<32} {format_value(base_value, kind):>12} {format_value(new_value, kind):>12}'
+                     f' {ratio:>7.2f}x{flag}')
+    return '\n'.join(lines) + '\n'
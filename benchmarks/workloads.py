@@ -0,0 +1,98 @@
+INDENT = '    '
+
+# Number of variables the flat script cycles through
+FLAT_VARIABLES = 16
+
+def flat_script(size):
+    # `size` top-level assignments and arithmetic with an occasional output,
+    # the shape of long generated or configuration-like scripts
+    operators = ('plus', 'minus', 'times', 'divide')
+    lines = [f'v{i} is now {i + 1}' for i in range(FLAT_VARIABLES)]
+    for i in range(size):
+        target = i % FLAT_VARIABLES
+        source = (i * 7 + 3) % FLAT_VARIABLES
+        operator = operators[i % len(operators)]
+        operand = 1 if operator in ('times', 'divide') else i % 10
+        lines.append(f'v{target} is now v{source} {operator} {operand}')
+        if i % 100 == 99:
+            lines.append(f'output v{target}')
+    lines.append('output v0')
+    return '\n'.join(lines) + '\n'
+
+def nested_branches(size, depth=30):
+    # `size` top-level blocks of `if`s nested `depth` deep with an
+    # `otherwise`. `x` cycles through 1..depth, so successive blocks reach
+    # different depths. The parser gives `otherwise` to the innermost open
+    # `if` and needs one more line break to close each enclosing block, so
+    # blank lines follow every block
+    lines = ['x is now 0', 'y is now 0']
+    for _ in range(size):
+        lines.append('x is now x plus 1')
+        lines.append(f'if x > {depth}')
+        lines.append(f'{INDENT}x is now 1')
+        for level in range(depth):
+            indent = INDENT * level
+            lines.append(f'{indent}if x >= {level + 1}')
+            lines.append(f'{indent}{INDENT}y is now y plus 1')
+        lines.append('otherwise')
+        lines.append(f'{INDENT}y is now y minus 1')
+        lines.extend([''] * (depth - 1))
+    lines.append('output x')
+    lines.append('output y')
+    return '\n'.join(lines) + '\n'
+
+def counter_loop(size):
+    # A `repeat until` counter with a wrapping inner counter, which keeps the
+    # loop from being solved in closed form so every iteration really runs.
+    # The blank line closes the loop around the nested `if`
+    return (
+        'i is now 0\n'
+        'j is now 0\n'
+        f'repeat until i >= {size}\n'
+        f'{INDENT}i is now i plus 1\n'
+        f'{INDENT}j is now j plus 1\n'
+        f'{INDENT}if j = 10\n'
+        f'{INDENT * 2}j is now 0\n'
+        '\n'
+        'output i\n'
+        'output j\n'
+    )
+
+def output_loop(size):
+    # `size` iterations that each write a number and a string
+    return (
+        'i is now 0\n'
+        f'repeat {size} times\n'
+        f'{INDENT}i is now i plus 1\n'
+        f'{INDENT}output i\n'
+        f'{INDENT}output "line"\n'
+    )
+
+def list_math(size):
+    # Elementwise arithmetic over lists of `size` numbers, one statement per
+    # operation, so the time is all in the list operations
+    return (
+        f'xs is now [1 to {size}]\n'
+        'ys is now xs times 2\n'
+        'zs is now ys plus xs\n'
+        'ws is now zs divide xs\n'
+        'vs is now ws minus 1\n'
+        'n is now length of vs\n'
+        'output n\n'
+        'output vs[0]\n'
+    )
+
+# Name: (generator, default size)
+WORKLOADS = {
+    'flat': (flat_script, 20000),
+    'nested': (nested_branches, 300),
+    'counter': (counter_loop, 200000),
+    'output': (output_loop, 100000),
+    'lists': (list_math, 1000000),
+}
+
+def generate(name, size=None, scale=1.0):
+    generator, default = WORKLOADS[name]
+    if size is None:
+        size = max(1, int(default * scale))
+    return generator(size), size
@@ -0,0 +1,347 @@
+from array import array
+from interpreter import Interpreter, COMPARISONS
+from lists import make_list, number_range, item, length
+from parser import Statement, Assign, Print, Else, IfBlock, ForBlock, WhileBlock
+
+LOAD_CONST = 0
+LOAD_VAR = 1
+STORE_VAR = 2
+ADD = 3
+SUBTRACT = 4
+MULTIPLY = 5
+DIVIDE = 6
+COMPARE = 7
+JUMP = 8
+JUMP_IF_FALSE = 9
+JUMP_IF_TRUE = 10
+FOR_SETUP = 11
+FOR_ITER = 12
+PRINT = 13
+INPUT = 14
+UNSUPPORTED = 15
+BUILD_LIST = 16
+BUILD_RANGE = 17
+INDEX = 18
+LENGTH = 19
+POP = 20
+
+OPCODE_NAMES = {
+    LOAD_CONST: 'LOAD_CONST',
+    LOAD_VAR: 'LOAD_VAR',
+    STORE_VAR: 'STORE_VAR',
+    ADD: 'ADD',
+    SUBTRACT: 'SUBTRACT',
+    MULTIPLY: 'MULTIPLY',
+    DIVIDE: 'DIVIDE',
+    COMPARE: 'COMPARE',
+    JUMP: 'JUMP',
+    JUMP_IF_FALSE: 'JUMP_IF_FALSE',
+    JUMP_IF_TRUE: 'JUMP_IF_TRUE',
+    FOR_SETUP: 'FOR_SETUP',
+    FOR_ITER: 'FOR_ITER',
+    PRINT: 'PRINT',
+    INPUT: 'INPUT',
+    UNSUPPORTED: 'UNSUPPORTED',
+    BUILD_LIST: 'BUILD_LIST',
+    BUILD_RANGE: 'BUILD_RANGE',
+    INDEX: 'INDEX',
+    LENGTH: 'LENGTH',
+    POP: 'POP',
+}
+
+BINARY_OPCODES = {
+    '+': ADD,
+    '-': SUBTRACT,
+    '*': MULTIPLY,
+    '/': DIVIDE,
+}
+
+COMPARE_OPS = ('=', '!=', '>', '<', '>=', '<=')
+
+COMPARE_INDEX = {op: index for index, op in enumerate(COMPARE_OPS)}
+COMPARE_INDEX['=='] = COMPARE_INDEX['=']
+
+COMPARE_FUNCTIONS = tuple(COMPARISONS[op] for op in COMPARE_OPS)
+
+# Statements that leave nothing on the stack; any other statement is a bare
+# expression whose value is popped, so loop counters stay on top
+NO_VALUE_STATEMENTS = (Statement, Assign, Print, Else, IfBlock, ForBlock, WhileBlock)
+
+class Bytecode:
+    def __init__(self):
+        self.ops = array('B')
+        self.args = array('i')
+        self.consts = []
+        self.names = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def disassemble(self):
+        lines = []
+        for index, (op, arg) in enumerate(zip(self.ops, self.args)):
+            name = OPCODE_NAMES[op]
+            if op in (LOAD_CONST, UNSUPPORTED):
+                detail = repr(self.consts[arg])
+            elif op in (LOAD_VAR, STORE_VAR, INPUT):
+                detail = self.names[arg]
+            elif op == COMPARE:
+                detail = COMPARE_OPS[arg]
+            elif op in (JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE, FOR_ITER):
+                detail = f'-> {arg}'
+            elif op == BUILD_LIST:
+                detail = str(arg)
+            else:
+                detail = ''
+            lines.append(f'{index:>6} {name:<14} {detail}'.rstrip())
+        return '\n'.join(lines)
+
+class BytecodeCompiler:
+    def __init__(self):
+        self.code = Bytecode()
+        self.const_index = {}
+        self.name_index = {}
+
+    def compile(self, ast):
+        self.visit(ast)
+        return self.code
+
+    def emit(self, op, arg=0):
+        self.code.ops.append(op)
+        self.code.args.append(arg)
+        return len(self.code.ops) - 1
+
+    def patch(self, index, target):
+        self.code.args[index] = target
+
+    def const(self, value):
+        key = (type(value), value)
+        if key not in self.const_index:
+            self.const_index[key] = len(self.code.consts)
+            self.code.consts.append(value)
+        return self.const_index[key]
+
+    def name(self, name):
+        if name not in self.name_index:
+            self.name_index[name] = len(self.code.names)
+            self.code.names.append(name)
+        return self.name_index[name]
+
+    def visit(self, node):
+        method_name = f'visit_{type(node).__name__}'
+        visitor = getattr(self, method_name, self.visit_unknown)
+        return visitor(node)
+
+    def visit_unknown(self, node):
+        self.emit(UNSUPPORTED, self.const(type(node).__name__))
+
+    def visit_Statement(self, node):
+        for statement in node.statements:
+            self.visit(statement)
+            if not isinstance(statement, NO_VALUE_STATEMENTS):
+                self.emit(POP)
+
+    def visit_Number(self, node):
+        self.emit(LOAD_CONST, self.const(node.value))
+
+    def visit_String(self, node):
+        self.emit(LOAD_CONST, self.const(node.value))
+
+    def visit_Variable(self, node):
+        self.emit(LOAD_VAR, self.name(node.name))
+
+    def visit_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        self.emit(BINARY_OPCODES[node.op])
+
+    def visit_ListLiteral(self, node):
+        for element in node.elements:
+            self.visit(element)
+        self.emit(BUILD_LIST, len(node.elements))
+
+    def visit_Range(self, node):
+        self.visit(node.start)
+        self.visit(node.end)
+        self.emit(BUILD_RANGE)
+
+    def visit_Index(self, node):
+        self.visit(node.value)
+        self.visit(node.index)
+        self.emit(INDEX)
+
+    def visit_Length(self, node):
+        self.visit(node.value)
+        self.emit(LENGTH)
+
+    def visit_Input(self, node):
+        self.emit(INPUT, self.name(node.var_name))
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        self.emit(STORE_VAR, self.name(node.name))
+
+    def visit_Print(self, node):
+        self.visit(node.value)
+        self.emit(PRINT)
+
+    def visit_If(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        self.emit(COMPARE, COMPARE_INDEX[node.op])
+
+    def visit_Else(self, node):
+        self.visit(node.body)
+
+    def visit_IfBlock(self, node):
+        self.visit(node.condition)
+        jump_to_else = self.emit(JUMP_IF_FALSE)
+        self.visit(node.body)
+        if node.else_body:
+            jump_to_end = self.emit(JUMP)
+            self.patch(jump_to_else, len(self.code))
+            self.visit(node.else_body)
+            self.patch(jump_to_end, len(self.code))
+        else:
+            self.patch(jump_to_else, len(self.code))
+
+    def visit_ForBlock(self, node):
+        self.visit(node.count)
+        self.emit(FOR_SETUP)
+        start = self.emit(FOR_ITER)
+        self.visit(node.body)
+        self.emit(JUMP, start)
+        self.patch(start, len(self.code))
+
+    def visit_WhileBlock(self, node):
+        if node.invariant:
+            self.visit(node.left)
+            self.visit(node.right)
+            self.emit(COMPARE, COMPARE_INDEX[node.op])
+            exit_jump = self.emit(JUMP_IF_TRUE)
+            start = len(self.code)
+        else:
+            start = len(self.code)
+            self.visit(node.left)
+            self.visit(node.right)
+            self.emit(COMPARE, COMPARE_INDEX[node.op])
+            exit_jump = self.emit(JUMP_IF_TRUE)
+        self.visit(node.body)
+        self.emit(JUMP, start)
+        self.patch(exit_jump, len(self.code))
+
+class VirtualMachine:
+    def __init__(self, code, variables, output, inputs):
+        self.code = code
+        self.variables = variables
+        self.output = output
+        self.inputs = inputs
+
+    def run(self):
+        code = self.code
+        ops = code.ops
+        args = code.args
+        consts = code.consts
+        names = code.names
+        variables = self.variables
+        write = self.output.write
+        undefined = object()
+        slots = [variables.get(name, undefined) for name in names]
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        compare_functions = COMPARE_FUNCTIONS
+        end = len(ops)
+        pc = 0
+        try:
+            while pc < end:
+                op = ops[pc]
+                arg = args[pc]
+                pc += 1
+                if op == LOAD_VAR:
+                    value = slots[arg]
+                    if value is undefined:
+                        raise Exception(f'Runtime Error: Variable "{names[arg]}" is not defined')
+                    push(value)
+                elif op == LOAD_CONST:
+                    push(consts[arg])
+                elif op == STORE_VAR:
+                    slots[arg] = pop()
+                elif op == COMPARE:
+                    right = pop()
+                    stack[-1] = compare_functions[arg](stack[-1], right)
+                elif op == JUMP_IF_TRUE:
+                    if pop():
+                        pc = arg
+                elif op == JUMP_IF_FALSE:
+                    if not pop():
+                        pc = arg
+                elif op == JUMP:
+                    pc = arg
+                elif op <= DIVIDE:
+                    right = pop()
+                    left = pop()
+                    if op == DIVIDE and right == 0:
+                        raise Exception('Runtime Error: Division by zero')
+                    try:
+                        if op == ADD:
+                            push(left + right)
+                        elif op == SUBTRACT:
+                            push(left - right)
+                        elif op == MULTIPLY:
+                            push(left * right)
+                        else:
+                            push(left / right)
+                    except TypeError:
+                        symbol = '+-*/'[op - ADD]
+                        raise Exception(f'Runtime Error: Invalid operation {left} {symbol} {right}') from None
+                elif op == FOR_ITER:
+                    if stack[-1] > 0:
+                        stack[-1] -= 1
+                    else:
+                        pop()
+                        pc = arg
+                elif op == FOR_SETUP:
+                    stack[-1] = int(stack[-1])
+                elif op == PRINT:
+                    write(pop())
+                elif op == POP:
+                    pop()
+                elif op == INPUT:
+                    push(self.inputs.read(names[arg]))
+                elif op == UNSUPPORTED:
+                    raise Exception(f'Runtime Error: Unsupported operation {consts[arg]}')
+                # List operations come last so they cost the scalar ones nothing
+                elif op == BUILD_LIST:
+                    if arg:
+                        elements = stack[-arg:]
+                        del stack[-arg:]
+                    else:
+                        elements = []
+                    push(make_list(elements))
+                elif op == BUILD_RANGE:
+                    last = pop()
+                    stack[-1] = number_range(stack[-1], last)
+                elif op == INDEX:
+                    index = pop()
+                    stack[-1] = item(stack[-1], index)
+                elif op == LENGTH:
+                    stack[-1] = length(stack[-1])
+        finally:
+            for name, value in zip(names, slots):
+                if value is not undefined:
+                    variables[name] = value
+
+class VMInterpreter(Interpreter):
+    def __init__(self, ast, output=None, inputs=None):
+        super().__init__(ast, output, inputs)
+        self.code = BytecodeCompiler().compile(ast)
+
+    def interpret(self):
+        try:
+            VirtualMachine(self.code, self.variables, self.output, self.inputs).run()
+        finally:
+            self.output.flush()
+
+    def execute(self, node):
+        VirtualMachine(BytecodeCompiler().compile(node), self.variables, self.output, self.inputs).run()
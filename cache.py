@@ -0,0 +1,132 @@
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+from interpreter import VERSION
+
+CACHE_DIR_NAME = '__enlcache__'
+CACHE_SUFFIX = '.enlc'
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+def frontend_fingerprint():
+    # Any edit to the lexer or parser changes the cache keys, so stale
+    # trees are never loaded after the front end changes
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in ('lexer.py', 'parser.py'):
+        try:
+            with open(os.path.join(here, module), 'rb') as file:
+                digest.update(file.read())
+        except OSError:
+            digest.update(module.encode())
+    return digest.hexdigest()[:16]
+
+class ProgramCache:
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.tag = f'{VERSION}-{sys.implementation.cache_tag}-{frontend_fingerprint()}'
+
+    @classmethod
+    def for_script(cls, filename, max_size=DEFAULT_MAX_SIZE):
+        directory = os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_DIR_NAME)
+        return cls(directory, max_size)
+
+    def key(self, source_code):
+        digest = hashlib.sha256()
+        digest.update(self.tag.encode())
+        digest.update(b'\0')
+        digest.update(source_code.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def load(self, source_code):
+        key = self.key(source_code)
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                entry = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.discard(path)
+            return None
+
+        if not isinstance(entry, dict) or entry.get('key') != key or entry.get('tag') != self.tag:
+            self.discard(path)
+            return None
+
+        try:
+            # Bump the modification time so eviction treats it as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return entry['ast']
+
+    def store(self, source_code, ast):
+        key = self.key(source_code)
+        entry = {'key': key, 'tag': self.tag, 'ast': ast}
+        try:
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError):
+            return False
+        if len(data) > self.max_size:
+            return False
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, self.path(key))
+        except OSError:
+            self.discard(temp_path)
+            return False
+
+        self.evict()
+        return True
+
+    def entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            self.discard(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.discard(path)
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,247 @@
+from functools import partial
+from interpreter import Interpreter, COMPARISONS, OPERATORS
+from resolver import Resolver, UNDEFINED
+from analyzer import Analyzer
+from parser import Number, String, Variable
+from sinks import StdoutSink
+from inputs import PromptInput
+from lists import make_list, number_range, item, length
+
+class ClosureCompiler:
+    def __init__(self, slots, output=None, inputs=None, closed_form_loops=True):
+        self.slots = slots
+        self.values = slots.values
+        self.output = output if output is not None else StdoutSink()
+        self.inputs = inputs if inputs is not None else PromptInput(self.output)
+        self.closed_form_loops = closed_form_loops
+
+    def compile(self, node):
+        method_name = f'compile_{type(node).__name__}'
+        compiler = getattr(self, method_name, self.compile_unknown)
+        return compiler(node)
+
+    def compile_unknown(self, node):
+        message = f'Runtime Error: Unsupported operation {type(node).__name__}'
+        def run():
+            raise Exception(message)
+        return run
+
+    def compile_Statement(self, node):
+        statements = tuple(self.compile(statement) for statement in node.statements)
+        if len(statements) == 1:
+            return statements[0]
+        def run():
+            for statement in statements:
+                statement()
+        return run
+
+    def compile_Number(self, node):
+        value = node.value
+        return lambda: value
+
+    def compile_String(self, node):
+        value = node.value
+        return lambda: value
+
+    def compile_Variable(self, node):
+        values = self.values
+        name = node.name
+        slot = self.slots.slot(name)
+        if not node.checked:
+            # Proven defined wherever this runs
+            return partial(values.__getitem__, slot)
+        def run():
+            value = values[slot]
+            if value is UNDEFINED:
+                raise Exception(f'Runtime Error: Variable "{name}" is not defined')
+            return value
+        return run
+
+    def compile_BinOp(self, node):
+        op = node.op
+        function = OPERATORS[op]
+        values = self.values
+
+        if not node.checked:
+            # Proven to work, so nothing is guarded; operands proven defined
+            # come straight from their slots
+            left, right = node.left, node.right
+            if isinstance(left, Variable) and not left.checked and isinstance(right, (Number, String)):
+                slot = self.slots.slot(left.name)
+                constant = right.value
+                return lambda: function(values[slot], constant)
+            left = self.compile(left)
+            right = self.compile(right)
+            return lambda: function(left(), right())
+
+        if op != '/' and isinstance(node.left, Variable) and isinstance(node.right, (Number, String)):
+            name = node.left.name
+            slot = self.slots.slot(name)
+            constant = node.right.value
+            def run():
+                value = values[slot]
+                if value is UNDEFINED:
+                    raise Exception(f'Runtime Error: Variable "{name}" is not defined')
+                try:
+                    return function(value, constant)
+                except TypeError:
+                    raise Exception(f'Runtime Error: Invalid operation {value} {op} {constant}') from None
+            return run
+
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        if op == '/':
+            def run():
+                left_value = left()
+                right_value = right()
+                if right_value == 0:
+                    raise Exception('Runtime Error: Division by zero')
+                try:
+                    return left_value / right_value
+                except TypeError:
+                    raise Exception(f'Runtime Error: Invalid operation {left_value} {op} {right_value}') from None
+            return run
+
+        def run():
+            left_value = left()
+            right_value = right()
+            try:
+                return function(left_value, right_value)
+            except TypeError:
+                raise Exception(f'Runtime Error: Invalid operation {left_value} {op} {right_value}') from None
+        return run
+
+    def compile_If(self, node):
+        compare = COMPARISONS[node.op]
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        return lambda: compare(left(), right())
+
+    def compile_Else(self, node):
+        return self.compile(node.body)
+
+    def compile_IfBlock(self, node):
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+        if not node.else_body:
+            def run():
+                if condition():
+                    body()
+            return run
+
+        else_body = self.compile(node.else_body)
+        def run():
+            if condition():
+                body()
+            else:
+                else_body()
+        return run
+
+    def compile_ForBlock(self, node):
+        count = self.compile(node.count)
+        body = self.compile(node.body)
+        def run():
+            for _ in range(int(count())):
+                body()
+        return run
+
+    def compile_WhileBlock(self, node):
+        loop = self.compile_loop(node)
+        if not self.closed_form_loops:
+            return loop
+        # Imported here because loops builds on this compiler
+        from loops import LoopPlan
+        plan = LoopPlan.analyze(node, self.slots)
+        if plan is None or plan.steps is None:
+            return loop
+        def run():
+            if not plan.run_closed_form():
+                loop()
+        return run
+
+    def compile_loop(self, node):
+        compare = COMPARISONS[node.op]
+        body = self.compile(node.body)
+        values = self.values
+
+        if node.invariant:
+            left = self.compile(node.left)
+            right = self.compile(node.right)
+            def run():
+                if not compare(left(), right()):
+                    while True:
+                        body()
+            return run
+
+        if isinstance(node.left, Variable) and isinstance(node.right, (Number, String)):
+            name = node.left.name
+            slot = self.slots.slot(name)
+            constant = node.right.value
+            def run():
+                if values[slot] is UNDEFINED:
+                    raise Exception(f'Runtime Error: Variable "{name}" is not defined')
+                while not compare(values[slot], constant):
+                    body()
+            return run
+
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        def run():
+            while not compare(left(), right()):
+                body()
+        return run
+
+    def compile_ListLiteral(self, node):
+        elements = tuple(self.compile(element) for element in node.elements)
+        return lambda: make_list([element() for element in elements])
+
+    def compile_Range(self, node):
+        start = self.compile(node.start)
+        end = self.compile(node.end)
+        return lambda: number_range(start(), end())
+
+    def compile_Index(self, node):
+        value = self.compile(node.value)
+        index = self.compile(node.index)
+        return lambda: item(value(), index())
+
+    def compile_Length(self, node):
+        value = self.compile(node.value)
+        return lambda: length(value())
+
+    def compile_Assign(self, node):
+        values = self.values
+        slot = self.slots.slot(node.name)
+        value = self.compile(node.value)
+        def run():
+            values[slot] = value()
+        return run
+
+    def compile_Input(self, node):
+        read = self.inputs.read
+        name = node.var_name
+        return lambda: read(name)
+
+    def compile_Print(self, node):
+        value = self.compile(node.value)
+        write = self.output.write
+        def run():
+            write(value())
+        return run
+
+class ClosureInterpreter(Interpreter):
+    def __init__(self, ast, output=None, inputs=None):
+        super().__init__(ast, output, inputs)
+        self.compiler = ClosureCompiler(self.slots, self.output, self.inputs)
+        self.program = self.compiler.compile(ast)
+
+    def interpret(self):
+        try:
+            return self.program()
+        finally:
+            self.output.flush()
+
+    def execute(self, node):
+        Resolver(self.slots).resolve(node)
+        Analyzer(self.slots).analyze(node)
+        return self.compiler.compile(node)()
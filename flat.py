@@ -0,0 +1,415 @@
+import sys
+import mmap
+import struct
+from array import array
+from itertools import repeat
+from interpreter import Interpreter
+from resolver import UNDEFINED
+from bytecode import COMPARE_INDEX, COMPARE_FUNCTIONS
+from lists import make_list, number_range, item, length
+from parser import (AST, Statement, BinOp, Keyword, Assign, Number, String, Variable, ListLiteral,
+                    Range, Index, Length, Print, Input, If, Else, IfBlock, ForBlock, WhileBlock)
+
+# Node kinds. What the operand columns hold for each:
+#   STATEMENT, LIST   first: offset in items, second: count
+#   NUMBER            first: index in numbers
+#   STRING, KEYWORD   first: index in strings
+#   VARIABLE, INPUT   first: index in names
+#   ASSIGN            first: name, second: value node
+#   PRINT, ELSE, LENGTH  first: the one child node
+#   BINOP, IF         first, second: operand nodes, op: operator or comparison
+#   RANGE, INDEX      first, second: operand nodes
+#   IFBLOCK           first: condition, second: body, third: else node or -1
+#   FORBLOCK          first: count, second: body
+#   WHILEBLOCK        first, second: operand nodes, third: body,
+#                     op: comparison, plus INVARIANT when set
+STATEMENT = 0
+NUMBER = 1
+STRING = 2
+VARIABLE = 3
+BINOP = 4
+ASSIGN = 5
+PRINT = 6
+INPUT = 7
+IF = 8
+ELSE = 9
+IFBLOCK = 10
+FORBLOCK = 11
+WHILEBLOCK = 12
+KEYWORD = 13
+LIST = 14
+RANGE = 15
+INDEX = 16
+LENGTH = 17
+
+KIND_NAMES = ('Statement', 'Number', 'String', 'Variable', 'BinOp', 'Assign', 'Print', 'Input', 'If', 'Else',
+              'IfBlock', 'ForBlock', 'WhileBlock', 'Keyword', 'ListLiteral', 'Range', 'Index', 'Length')
+
+OPERATOR_SYMBOLS = ('+', '-', '*', '/')
+OPERATOR_INDEX = {symbol: index for index, symbol in enumerate(OPERATOR_SYMBOLS)}
+INVARIANT = 16
+
+MAGIC = b'ENLF'
+FORMAT_VERSION = 1
+BYTE_ORDERS = {'little': 1, 'big': 2}
+# magic, version, byte order, then the counts of nodes, items, numbers,
+# strings, names, string bytes and name bytes, and the root node
+HEADER = struct.Struct('<4sHH8i')
+ALIGNMENT = 8
+
+def padded(size):
+    return size + -size % ALIGNMENT
+
+def children(node):
+    # Child nodes in evaluation order
+    node_type = type(node)
+    if node_type is Statement:
+        return node.statements
+    if node_type is ListLiteral:
+        return node.elements
+    if node_type in (BinOp, If):
+        return (node.left, node.right)
+    if node_type in (Assign, Print, Length):
+        return (node.value,)
+    if node_type is Else:
+        return (node.body,)
+    if node_type is IfBlock:
+        if node.else_body:
+            return (node.condition, node.body, node.else_body)
+        return (node.condition, node.body)
+    if node_type is ForBlock:
+        return (node.count, node.body)
+    if node_type is WhileBlock:
+        return (node.left, node.right, node.body)
+    if node_type is Range:
+        return (node.start, node.end)
+    if node_type is Index:
+        return (node.value, node.index)
+    return ()
+
+class Pool:
+    # Distinct strings stored back to back as UTF-8, with the offset of each
+    def __init__(self):
+        self.index = {}
+        self.offsets = array('i', [0])
+        self.data = bytearray()
+
+    def add(self, text):
+        index = self.index.get(text)
+        if index is None:
+            index = self.index[text] = len(self.offsets) - 1
+            self.data += text.encode('utf-8')
+            self.offsets.append(len(self.data))
+        return index
+
+class FlatProgram:
+    # A syntax tree stored as parallel typed arrays, one entry per node,
+    # with its literals and variable names in pools. Nodes come before the
+    # nodes that contain them, so the root is the last one. Loaded files are
+    # memory-mapped and the arrays are views into the mapping, so loading
+    # builds no Python object per node and processes running the same file
+    # share its pages
+    def __init__(self, kinds, ops, first, second, third, lines, columns, items, numbers,
+                 string_offsets, string_data, name_offsets, name_data, root, mapping=None):
+        self.kinds = kinds
+        self.ops = ops
+        self.first = first
+        self.second = second
+        self.third = third
+        self.lines = lines
+        self.columns = columns
+        self.items = items
+        self.numbers = numbers
+        self.string_offsets = string_offsets
+        self.string_data = string_data
+        self.name_offsets = name_offsets
+        self.name_data = name_data
+        self.root = root
+        self.mapping = mapping
+        self.strings = {}
+        self.names = [self.decode(name_offsets, name_data, index) for index in range(len(name_offsets) - 1)]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def decode(self, offsets, data, index):
+        return str(data[offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def string(self, index):
+        # Decoded on first use
+        text = self.strings.get(index)
+        if text is None:
+            text = self.strings[index] = self.decode(self.string_offsets, self.string_data, index)
+        return text
+
+    def position(self, index):
+        # (line, column) of a node, or None for nodes built without one
+        line = self.lines[index]
+        return (line, self.columns[index]) if line else None
+
+    @classmethod
+    def from_ast(cls, ast):
+        kinds = array('B')
+        ops = array('B')
+        first = array('i')
+        second = array('i')
+        third = array('i')
+        lines = array('i')
+        columns = array('i')
+        items = array('i')
+        numbers = array('d')
+        number_index = {}
+        strings = Pool()
+        names = Pool()
+
+        # Post-order without recursion: a node is encoded once all of its
+        # children are, and their indices wait on `done`
+        done = []
+        stack = [(ast, None)]
+        while stack:
+            node, nodes = stack.pop()
+            if nodes is None:
+                nodes = children(node)
+                stack.append((node, nodes))
+                stack.extend((child, None) for child in reversed(nodes))
+                continue
+            count = len(nodes)
+            if count:
+                indices = done[-count:]
+                del done[-count:]
+            else:
+                indices = ()
+
+            node_type = type(node)
+            op = 0
+            a = b = c = 0
+            if node_type is Statement or node_type is ListLiteral:
+                kind = STATEMENT if node_type is Statement else LIST
+                a, b = len(items), count
+                items.extend(indices)
+            elif node_type is Number:
+                kind = NUMBER
+                if type(node.value) is not float:
+                    raise Exception(f'Cannot compile the number {node.value!r}')
+                # By bit pattern, so 0.0 and -0.0 stay apart
+                key = node.value.hex()
+                a = number_index.get(key)
+                if a is None:
+                    a = number_index[key] = len(numbers)
+                    numbers.append(node.value)
+            elif node_type is String or node_type is Keyword:
+                kind = STRING if node_type is String else KEYWORD
+                a = strings.add(node.value)
+            elif node_type is Variable:
+                kind, a = VARIABLE, names.add(node.name)
+            elif node_type is Input:
+                kind, a = INPUT, names.add(node.var_name)
+            elif node_type is Assign:
+                kind, a, b = ASSIGN, names.add(node.name), indices[0]
+            elif node_type is BinOp:
+                kind, op = BINOP, OPERATOR_INDEX[node.op]
+                a, b = indices
+            elif node_type is If:
+                kind, op = IF, COMPARE_INDEX[node.op]
+                a, b = indices
+            elif node_type is IfBlock:
+                kind = IFBLOCK
+                a, b = indices[0], indices[1]
+                c = indices[2] if count == 3 else -1
+            elif node_type is ForBlock:
+                kind = FORBLOCK
+                a, b = indices
+            elif node_type is WhileBlock:
+                kind, op = WHILEBLOCK, COMPARE_INDEX[node.op] | (INVARIANT if node.invariant else 0)
+                a, b, c = indices
+            elif node_type in (Print, Else, Length):
+                kind = PRINT if node_type is Print else ELSE if node_type is Else else LENGTH
+                a = indices[0]
+            elif node_type is Range or node_type is Index:
+                kind = RANGE if node_type is Range else INDEX
+                a, b = indices
+            else:
+                raise Exception(f'Cannot compile {node_type.__name__} nodes')
+
+            done.append(len(kinds))
+            kinds.append(kind)
+            ops.append(op)
+            first.append(a)
+            second.append(b)
+            third.append(c)
+            lines.append(getattr(node, 'line', None) or 0)
+            columns.append(getattr(node, 'column', None) or 0)
+
+        return cls(kinds, ops, first, second, third, lines, columns, items, numbers,
+                   strings.offsets, bytes(strings.data), names.offsets, bytes(names.data), len(kinds) - 1)
+
+    def sections(self):
+        return (self.kinds, self.ops, self.first, self.second, self.third, self.lines, self.columns,
+                self.items, self.numbers, self.string_offsets, self.string_data, self.name_offsets, self.name_data)
+
+    def save(self, path):
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDERS[sys.byteorder], len(self.kinds), len(self.items),
+                             len(self.numbers), len(self.string_offsets) - 1, len(self.name_offsets) - 1,
+                             len(self.string_data), len(self.name_data), self.root)
+        with open(path, 'wb') as file:
+            file.write(header)
+            for section in self.sections():
+                data = memoryview(section).cast('B')
+                file.write(data)
+                file.write(bytes(padded(len(data)) - len(data)))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            try:
+                mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                mapping = b''
+        if len(mapping) < HEADER.size:
+            raise Exception(f"'{path}' is not a compiled enlang program")
+        magic, version, byte_order, nodes, items, numbers, strings, names, string_bytes, name_bytes, root = \
+            HEADER.unpack_from(mapping)
+        if magic != MAGIC:
+            raise Exception(f"'{path}' is not a compiled enlang program")
+        if version != FORMAT_VERSION:
+            raise Exception(f"'{path}' was compiled for format version {version}, expected {FORMAT_VERSION}")
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            raise Exception(f"'{path}' was compiled on a machine with a different byte order")
+
+        view = memoryview(mapping)
+        offset = HEADER.size
+        sections = []
+        for count, code in ((nodes, 'B'), (nodes, 'B'), (nodes, 'i'), (nodes, 'i'), (nodes, 'i'), (nodes, 'i'),
+                            (nodes, 'i'), (items, 'i'), (numbers, 'd'), (strings + 1, 'i'), (string_bytes, 'B'),
+                            (names + 1, 'i'), (name_bytes, 'B')):
+            size = count * struct.calcsize(code)
+            if offset + size > len(mapping):
+                raise Exception(f"'{path}' is truncated")
+            sections.append(view[offset:offset + size].cast(code))
+            offset += padded(size)
+        return cls(*sections, root, mapping)
+
+    def close(self):
+        # Releases the mapping of a loaded program; the program is unusable after
+        if self.mapping is not None:
+            for section in self.sections():
+                if isinstance(section, memoryview):
+                    section.release()
+            self.mapping.close()
+            self.mapping = None
+
+class FlatInterpreter(Interpreter):
+    # Runs a FlatProgram straight from its arrays. Blocks are walked with an
+    # explicit stack like Interpreter.run_block; expressions, which nest only
+    # a few levels, are evaluated recursively. Given a syntax tree, it is
+    # flattened first. Loops always run step by step, as the closed-form
+    # loop analysis needs the tree
+    def __init__(self, program, output=None, inputs=None):
+        super().__init__(Statement([]), output, inputs)
+        if isinstance(program, AST):
+            program = FlatProgram.from_ast(program)
+        self.program = program
+
+    def interpret(self):
+        try:
+            return self.run(self.program)
+        finally:
+            self.output.flush()
+
+    def execute(self, node):
+        return self.run(FlatProgram.from_ast(node))
+
+    def run(self, program):
+        kinds = program.kinds
+        ops = program.ops
+        first = program.first
+        second = program.second
+        third = program.third
+        items = program.items
+        numbers = program.numbers
+        names = program.names
+        values = self.values
+        # Slot of each of the program's names in this interpreter
+        slot_of = [self.slots.slot(name) for name in names]
+        write = self.output.write
+        read = self.inputs.read
+        operate = self.operate
+
+        def evaluate(index):
+            kind = kinds[index]
+            if kind == VARIABLE:
+                value = values[slot_of[first[index]]]
+                if value is UNDEFINED:
+                    raise Exception(f'Runtime Error: Variable "{names[first[index]]}" is not defined')
+                return value
+            if kind == NUMBER:
+                return numbers[first[index]]
+            if kind == BINOP:
+                left = evaluate(first[index])
+                return operate(OPERATOR_SYMBOLS[ops[index]], left, evaluate(second[index]))
+            if kind == IF:
+                left = evaluate(first[index])
+                return COMPARE_FUNCTIONS[ops[index]](left, evaluate(second[index]))
+            if kind == STRING:
+                return program.string(first[index])
+            if kind == INPUT:
+                return read(names[first[index]])
+            if kind == LIST:
+                start = first[index]
+                return make_list([evaluate(element) for element in items[start:start + second[index]]])
+            if kind == RANGE:
+                start = evaluate(first[index])
+                return number_range(start, evaluate(second[index]))
+            if kind == INDEX:
+                value = evaluate(first[index])
+                return item(value, evaluate(second[index]))
+            if kind == LENGTH:
+                return length(evaluate(first[index]))
+            raise Exception(f'Runtime Error: Unsupported operation {KIND_NAMES[kind]}')
+
+        def loop(index):
+            compare = COMPARE_FUNCTIONS[ops[index] & ~INVARIANT]
+            left, right, body = first[index], second[index], third[index]
+            if ops[index] & INVARIANT:
+                if compare(evaluate(left), evaluate(right)):
+                    return
+                while True:
+                    yield body
+            while not compare(evaluate(left), evaluate(right)):
+                yield body
+
+        stack = [iter((program.root,))]
+        push = stack.append
+        pop = stack.pop
+        while stack:
+            for index in stack[-1]:
+                kind = kinds[index]
+                if kind == ASSIGN:
+                    values[slot_of[first[index]]] = evaluate(second[index])
+                elif kind == PRINT:
+                    write(evaluate(first[index]))
+                elif kind == STATEMENT:
+                    start = first[index]
+                    push(iter(items[start:start + second[index]]))
+                    break
+                elif kind == IFBLOCK:
+                    if evaluate(first[index]):
+                        push(iter((second[index],)))
+                        break
+                    if third[index] >= 0:
+                        push(iter((third[index],)))
+                        break
+                elif kind == FORBLOCK:
+                    push(repeat(second[index], int(evaluate(first[index]))))
+                    break
+                elif kind == WHILEBLOCK:
+                    push(loop(index))
+                    break
+                elif kind == ELSE:
+                    push(iter((first[index],)))
+                    break
+                else:
+                    evaluate(index)
+            else:
+                pop()
@@ -0,0 +1,235 @@
+from bisect import bisect_left
+from lexer import Lexer
+from parser import Parser, Statement, AST
+
+def common_prefix(old, new):
+    # Length of the longest common prefix, found by comparing ever smaller
+    # slices so the characters are compared in C
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[low:middle] == new[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def common_suffix(old, new, limit):
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[len(old) - middle:len(old) - low] == new[len(new) - middle:len(new) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def shift_lines(node, delta):
+    stack = [node]
+    push = stack.append
+    while stack:
+        node = stack.pop()
+        try:
+            node.line += delta
+        except AttributeError:
+            # Block bodies are built without a position
+            pass
+        for field in type(node).__slots__:
+            child = getattr(node, field, None)
+            if isinstance(child, AST):
+                push(child)
+            elif type(child) is list:
+                stack.extend(child)
+
+class TokenCursor:
+    # Feeds the parser the cached tokens from a given line on and remembers
+    # where the token it handed out last sits
+    def __init__(self, line_tokens, line, index):
+        self.line_tokens = line_tokens
+        self.line = line
+        self.index = index - 1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.index += 1
+        while self.line < len(self.line_tokens):
+            tokens = self.line_tokens[self.line]
+            if self.index < len(tokens):
+                return tokens[self.index]
+            self.line += 1
+            self.index = 0
+        raise StopIteration
+
+    @property
+    def position(self):
+        return self.line, self.index
+
+class StatementRecord:
+    __slots__ = ('node', 'start', 'end')
+
+    def __init__(self, node, start, end):
+        # start is the (line, index) of the statement's first token and end
+        # that of the token the parser looked at last, None at end of input
+        self.node = node
+        self.start = start
+        self.end = end
+
+class IncrementalFrontEnd:
+    # Lexer and parser that keep their results between versions of a
+    # source. Tokens are cached per line. On update, lexing restarts at the
+    # first changed line and stops as soon as it reaches an unchanged line
+    # that starts in the same state as before. Parsing keeps the top-level
+    # statements that ended before that line, and the ones that start in
+    # the unchanged lines after the edit. Lines are 0-based here, token
+    # lines 1-based
+    def __init__(self):
+        self.text = ''
+        self.line_tokens = [[]]
+        # Whether lexing a line starts afresh: the line before ended in a
+        # NEWLINE token, rather than inside a string or a multi-line header
+        self.clean = [True]
+        self.records = []
+        self.starts = []
+        self.ast = Statement([])
+        self.relexed_lines = 0
+        self.reparsed_statements = 0
+
+    @property
+    def tokens(self):
+        return [token for tokens in self.line_tokens for token in tokens]
+
+    def update(self, text):
+        # Returns the tree of `text`. On a syntax error the previous version
+        # is kept, so the next update is compared against it
+        old = self.text
+        if text == old:
+            self.relexed_lines = self.reparsed_statements = 0
+            return self.ast
+        prefix = common_prefix(old, text)
+        suffix = common_suffix(old, text, min(len(old), len(text)) - prefix)
+        delta = text.count('\n') - old.count('\n')
+
+        # Lines before `first` are unchanged up to and including their newline
+        first = old.count('\n', 0, prefix)
+        offset = old.rfind('\n', 0, prefix) + 1
+        # Lines from `last` on are unchanged through the end of the text,
+        # and so is the newline before them
+        last = old.count('\n', 0, len(old) - suffix) + 1
+
+        start = first
+        while not self.clean[start]:
+            start -= 1
+            offset = old.rfind('\n', 0, offset - 1) + 1
+        line_tokens, clean, resumed = self.relex(text, start, offset, last, delta)
+        if resumed is not None:
+            self.shift_tokens(line_tokens[resumed:], delta)
+        try:
+            records, starts, reparsed = self.reparse(line_tokens, start, resumed, delta)
+        except Exception:
+            if resumed is not None:
+                self.shift_tokens(line_tokens[resumed:], -delta)
+            raise
+
+        self.text = text
+        self.line_tokens = line_tokens
+        self.clean = clean
+        self.records = records
+        self.starts = starts
+        self.ast = Statement([record.node for record in records])
+        self.reparsed_statements = reparsed
+        return self.ast
+
+    def relex(self, text, start, offset, last, delta):
+        # Lexes from line `start`, which begins at `offset`, until an old
+        # line from `last` on is reached in a clean state, and reuses the
+        # old lines from there. Returns the new caches and the line lexing
+        # stopped at, or None if it lexed to the end
+        relexed = [[]]
+        relexed_clean = [True]
+        resumed = None
+        for token in Lexer(text).start_at(offset, start + 1).scan():
+            while token.line - start > len(relexed):
+                relexed.append([])
+                relexed_clean.append(False)
+            relexed[-1].append(token)
+            if token.type != 'NEWLINE':
+                continue
+            line = token.line
+            relexed.append([])
+            relexed_clean.append(True)
+            if line >= last + delta and self.clean[line - delta]:
+                resumed = line
+                break
+
+        if resumed is None:
+            missing = text.count('\n') + 1 - start - len(relexed)
+            relexed.extend([] for _ in range(missing))
+            relexed_clean.extend([False] * missing)
+            self.relexed_lines = len(relexed)
+            return self.line_tokens[:start] + relexed, self.clean[:start] + relexed_clean, None
+        self.relexed_lines = resumed - start
+        line_tokens = self.line_tokens[:start] + relexed[:resumed - start] + self.line_tokens[resumed - delta:]
+        clean = self.clean[:start] + relexed_clean[:resumed - start] + self.clean[resumed - delta:]
+        return line_tokens, clean, resumed
+
+    def shift_tokens(self, line_tokens, delta):
+        if delta:
+            for tokens in line_tokens:
+                for token in tokens:
+                    token.line += delta
+
+    def reparse(self, line_tokens, start, resumed, delta):
+        # Keeps the statements that did not look at any line from `start`
+        # on, then parses until a statement starts where an old one started
+        # in the lines lexing resumed at
+        records = self.records
+        starts = self.starts
+        # Each statement ends where the next one starts, so only the last
+        # one starting before `start` can have looked past it
+        kept = bisect_left(starts, (start, 0))
+        if kept and (records[kept - 1].end is None or records[kept - 1].end[0] >= start):
+            kept -= 1
+        new_records = records[:kept]
+        new_starts = starts[:kept]
+        line, index = records[kept - 1].end if kept else (0, 0)
+
+        cursor = TokenCursor(line_tokens, line, index)
+        parser = Parser(cursor)
+        # Positions in error messages count tokens from the start
+        parser.pos = sum(map(len, line_tokens[:line])) + index
+        reparsed = 0
+        while parser.current_token:
+            if parser.current_token.type == 'NEWLINE':
+                parser.advance()
+                continue
+            position = cursor.position
+            if resumed is not None and position[0] >= resumed:
+                old = (position[0] - delta, position[1])
+                found = bisect_left(starts, old)
+                if found < len(starts) and starts[found] == old:
+                    shifted = self.shift(records[found:], delta)
+                    new_records.extend(shifted)
+                    new_starts.extend(record.start for record in shifted)
+                    break
+            node = parser.expr()
+            end = cursor.position if parser.current_token else None
+            if node:
+                new_records.append(StatementRecord(node, position, end))
+                new_starts.append(position)
+                reparsed += 1
+            while parser.current_token and parser.current_token.type == 'NEWLINE':
+                parser.advance()
+        return new_records, new_starts, reparsed
+
+    def shift(self, records, delta):
+        if not delta:
+            return records
+        shifted = []
+        for record in records:
+            shift_lines(record.node, delta)
+            start = (record.start[0] + delta, record.start[1])
+            end = None if record.end is None else (record.end[0] + delta, record.end[1])
+            shifted.append(StatementRecord(record.node, start, end))
+        return shifted
@@ -0,0 +1,47 @@
+def parse_input(text):
+    # Same rule as typed input: plain digit strings become numbers
+    if text.isdigit():
+        return float(text)
+    else:
+        return text
+
+def read_lines(stream):
+    # Every line of a text stream at once, without a final empty line
+    lines = stream.read().split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()
+    return lines
+
+class PromptInput:
+    # Asks for each value on the terminal, as enlang always has
+    def __init__(self, output):
+        self.output = output
+
+    def read(self, name):
+        # Pending output has to appear before the prompt
+        self.output.flush()
+        return parse_input(input(f"Input value for {name}: "))
+
+class IterableInput:
+    # Takes values from any iterable without prompting; each value is
+    # converted to text and parsed like a typed line
+    def __init__(self, values):
+        self.values = iter(values)
+
+    def read(self, name):
+        for value in self.values:
+            return parse_input(str(value))
+        raise Exception(f'Runtime Error: No input left for "{name}"')
+
+class StreamInput(IterableInput):
+    # One value per line of a text stream, read as the program asks
+    def __init__(self, stream):
+        super().__init__(line.rstrip('\n') for line in stream)
+
+class FileInput(IterableInput):
+    # One value per line of a file, read in one go
+    def __init__(self, path):
+        with open(path, 'r') as file:
+            lines = read_lines(file)
+        super().__init__(lines)
+        self.path = path
@@ -0,0 +1,139 @@
+import sys
+import time
+import json
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from parser import AST
+from interpreter import Interpreter
+
+class PhaseStats:
+    __slots__ = ('name', 'wall', 'cpu', 'peak', 'retained')
+
+    def __init__(self, name, wall, cpu, peak=None, retained=None):
+        self.name = name
+        self.wall = wall
+        self.cpu = cpu
+        self.peak = peak
+        self.retained = retained
+
+def count_nodes(ast):
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        count += 1
+        for field in type(node).__slots__:
+            child = getattr(node, field, None)
+            if isinstance(child, list):
+                stack.extend(item for item in child if isinstance(item, AST))
+            elif isinstance(child, AST):
+                stack.append(child)
+    return count
+
+class Instrumentation:
+    # Records the wall and CPU time of each phase of a run and, with
+    # memory=True, the tracemalloc peak and the memory each phase kept.
+    # Also counts tokens, tree nodes and tree-walker dispatches
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.phases = []
+        self.counts = {}
+        self.started_tracing = False
+
+    @contextmanager
+    def phase(self, name):
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stats = PhaseStats(name, time.perf_counter() - wall, time.process_time() - cpu)
+            if self.memory:
+                current, stats.peak = tracemalloc.get_traced_memory()
+                stats.retained = current - before
+            self.phases.append(stats)
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def count_nodes(self, ast):
+        self.count('nodes', count_nodes(ast))
+
+    def attach(self, interpreter):
+        # Counts the visits of engines that walk the tree; the compiling
+        # engines have no per-node dispatch to count
+        if type(interpreter).interpret is not Interpreter.interpret:
+            return
+        visit = interpreter.visit
+        counts = self.counts
+        counts.setdefault('dispatches', 0)
+        def counting_visit(node):
+            counts['dispatches'] += 1
+            return visit(node)
+        interpreter.visit = counting_visit
+
+    def finish(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def to_dict(self):
+        phases = [{'name': stats.name, 'wall': stats.wall, 'cpu': stats.cpu,
+                   'peak': stats.peak, 'retained': stats.retained} for stats in self.phases]
+        total = {'wall': sum(stats.wall for stats in self.phases),
+                 'cpu': sum(stats.cpu for stats in self.phases)}
+        return {'phases': phases, 'total': total, 'counts': dict(self.counts)}
+
+    def report(self):
+        header = f'{"phase":<10} {"wall ms":>10} {"cpu ms":>10}'
+        if self.memory:
+            header += f' {"peak KiB":>10} {"kept KiB":>10}'
+        lines = [header]
+        for stats in self.phases:
+            lines.append(self.format_row(stats.name, stats.wall, stats.cpu, stats.peak, stats.retained))
+        total = self.to_dict()['total']
+        lines.append(self.format_row('total', total['wall'], total['cpu']))
+        if self.counts:
+            lines.append(', '.join(f'{name}: {value}' for name, value in self.counts.items()))
+        return '\n'.join(lines) + '\n'
+
+    def format_row(self, name, wall, cpu, peak=None, retained=None):
+        row = f'{name:<10} {wall * 1000:>10.3f} {cpu * 1000:>10.3f}'
+        if peak is not None:
+            row += f' {peak / 1024:>10.1f} {retained / 1024:>10.1f}'
+        return row
+
+    def write(self, path=None):
+        # JSON to `path`, or the text report to stderr
+        if path is None:
+            sys.stderr.write(self.report())
+            return
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+            file.write('\n')
+
+# Shared by every phase that is not being measured
+NULL_PHASE = nullcontext()
+
+class NullInstrumentation:
+    # Stands in when nothing is being measured, so the phases cost one
+    # empty `with` each
+    def phase(self, name):
+        return NULL_PHASE
+
+    def count(self, name, value):
+        pass
+
+    def count_nodes(self, ast):
+        pass
+
+    def attach(self, interpreter):
+        pass
+
+NO_INSTRUMENTATION = NullInstrumentation()
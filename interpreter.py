@@ -1,10 +1,67 @@
+import operator
+from functools import partial
+from itertools import repeat
+from resolver import SlotTable, SlotView, Resolver, UNDEFINED
+from sinks import StdoutSink
+from inputs import PromptInput
+from lists import make_list, number_range, item, length
+from analyzer import Analyzer
+from parser import Statement, Number, String, Variable, Else, IfBlock, ForBlock, WhileBlock
+
+VERSION = '0.2.0'
+
+COMPARISONS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+}
+
+OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+}
+
 class Interpreter:
-    def __init__(self, ast):
+    def __init__(self, ast, output=None, inputs=None):
         self.ast = ast
-        self.variables = {}
+        self.output = output if output is not None else StdoutSink()
+        self.inputs = inputs if inputs is not None else PromptInput(self.output)
+        self.slots = SlotTable()
+        self.values = self.slots.values
+        # Dict-style view of the slots for embedders
+        self.variables = SlotView(self.slots)
+        self.loop_plans = {}
+        # Blocks that run_block walks itself; subclasses that override a
+        # block's visitor get it called as usual
+        self.blocks = {}
+        for node_type, block in ((Statement, self.block_Statement), (Else, self.block_Else),
+                                 (IfBlock, self.block_IfBlock), (ForBlock, self.block_ForBlock),
+                                 (WhileBlock, self.block_WhileBlock)):
+            name = f'visit_{node_type.__name__}'
+            if getattr(type(self), name) is getattr(Interpreter, name):
+                self.blocks[node_type] = block
+        Resolver(self.slots).resolve(ast)
+        # Errors the analysis found certain to happen if their line runs
+        self.problems = Analyzer(self.slots).analyze(ast)
 
     def interpret(self):
-        return self.visit(self.ast)
+        try:
+            return self.visit(self.ast)
+        finally:
+            self.output.flush()
+
+    def execute(self, node):
+        # Runs one more top-level node against the current variables; the
+        # caller flushes self.output once the session is done
+        Resolver(self.slots).resolve(node)
+        Analyzer(self.slots).analyze(node)
+        return self.visit(node)
     
     def visit(self, node):
         method_name = f'visit_{type(node).__name__}'
@@ -15,100 +72,171 @@ class Interpreter:
         raise Exception(f'Runtime Error: Unsupported operation {type(node).__name__}')
     
     def visit_BinOp(self, node):
-        left = self.visit(node.left)
-        right = self.visit(node.right)
-        
+        if node.checked:
+            left = self.visit(node.left)
+            right = self.visit(node.right)
+            return self.operate(node.op, left, right)
+        # The analysis proved the operation valid, so it runs unguarded, and
+        # operands that are defined variables or numbers skip the dispatch
+        left = node.left
+        if type(left) is Variable and not left.checked:
+            left = self.values[left.slot]
+        elif type(left) is Number:
+            left = left.value
+        else:
+            left = self.visit(left)
+        right = node.right
+        if type(right) is Variable and not right.checked:
+            right = self.values[right.slot]
+        elif type(right) is Number:
+            right = right.value
+        else:
+            right = self.visit(right)
+        return OPERATORS[node.op](left, right)
+
+    def operate(self, op, left, right):
         try:
-            if node.op == '+':
+            if op == '+':
                 return left + right
-            elif node.op == '-':
+            elif op == '-':
                 return left - right
-            elif node.op == '*':
+            elif op == '*':
                 return left * right
-            elif node.op == '/':
+            elif op == '/':
                 if right == 0:
                     raise Exception('Runtime Error: Division by zero')
                 return left / right
         except TypeError:
-            raise Exception(f'Runtime Error: Invalid operation {left} {node.op} {right}')
+            raise Exception(f'Runtime Error: Invalid operation {left} {op} {right}')
     
     def visit_If(self, node):
         left = self.visit(node.left)
         right = self.visit(node.right)
-        
-        if node.op == '==':
-            return left == right
-        elif node.op == '!=':
-            return left != right
-        elif node.op == '>':
-            return left > right
-        elif node.op == '<':
-            return left < right
+        return COMPARISONS[node.op](left, right)
     
     def visit_Else(self, node):
-        self.visit(node.body)
+        self.run_block(node)
     
     def visit_IfBlock(self, node):
-        condition = self.visit(node.condition)
-        if condition:
-            self.visit(node.body)
-        else:
-            if node.else_body:
-                self.visit(node.else_body)
+        self.run_block(node)
           
     def visit_ForBlock(self, node):
+        self.run_block(node)
+
+    def loop_plan(self, node):
+        if node not in self.loop_plans:
+            # Imported here because loops builds on the closure compiler
+            from loops import LoopPlan
+            self.loop_plans[node] = LoopPlan.analyze(node, self.slots)
+        return self.loop_plans[node]
+
+    def visit_WhileBlock(self, node):
+        self.run_block(node)
+
+    def run_block(self, node):
+        # Walks a block and everything nested in it with an explicit stack
+        # instead of recursion, so nesting depth is not limited by the
+        # recursion limit. Each open block is an iterator over the nodes it
+        # runs next; simple statements and expressions use the visitors
+        blocks = self.blocks
+        visit = self.visit
+        stack = [blocks[type(node)](node)]
+        push = stack.append
+        pop = stack.pop
+        while stack:
+            for child in stack[-1]:
+                block = blocks.get(type(child))
+                if block is None:
+                    visit(child)
+                else:
+                    push(block(child))
+                    break
+            else:
+                pop()
+
+    def block_Statement(self, node):
+        return iter(node.statements)
+
+    def block_Else(self, node):
+        yield node.body
+
+    def block_IfBlock(self, node):
+        if self.visit(node.condition):
+            yield node.body
+        elif node.else_body:
+            yield node.else_body
+
+    def block_ForBlock(self, node):
         count = self.visit(node.count)
+        body = node.body
         for _ in range(int(count)):
-            self.visit(node.body)
+            yield body
+
+    def block_WhileBlock(self, node):
+        # Counting loops without output or input skip the per-node dispatch
+        plan = self.loop_plan(node)
+        if plan is not None:
+            plan.run()
+            return
 
-    def visit_WhileBlock(self, node):
         left = self.visit(node.left)
-        op = self.visit(node.op)
+        compare = COMPARISONS[node.op]
         right = self.visit(node.right)
-        while True:
-            if op == '==':
-                if left == right:
-                    break
-            elif op == '!=':
-                if left != right:
-                    break
-            elif op == '>':
-                if left > right:
-                    break
-            elif op == '<':
-                if left < right:
-                    break
-            elif op == '>=':
-                if left >= right:
-                    break
-            elif op == '<=':
-                if left <= right:
-                    break
-            self.visit(node.body)
-            left = self.visit(node.left)
-            right = self.visit(node.right)
+        body = node.body
+        if node.invariant:
+            if compare(left, right):
+                return
+            while True:
+                yield body
+        read_left = self.reader(node.left)
+        read_right = self.reader(node.right)
+        while not compare(left, right):
+            yield body
+            left = read_left()
+            right = read_right()
+
+    def reader(self, node):
+        # Callable giving the value of an expression that is evaluated over
+        # and over; defined variables and literals need no dispatch or check
+        if type(node) is Variable and not node.checked:
+            return partial(self.values.__getitem__, node.slot)
+        if type(node) in (Number, String):
+            return repeat(node.value).__next__
+        return partial(self.visit, node)
             
     def visit_Number(self, node):
         return node.value
     
     def visit_Variable(self, node):
-        if node.name not in self.variables:
+        if not node.checked:
+            # Proven defined wherever this runs
+            return self.values[node.slot]
+        value = self.values[node.slot]
+        if value is UNDEFINED:
             raise Exception(f'Runtime Error: Variable "{node.name}" is not defined')
-        return self.variables[node.name]
+        return value
+    
+    def visit_ListLiteral(self, node):
+        return make_list([self.visit(element) for element in node.elements])
+
+    def visit_Range(self, node):
+        return number_range(self.visit(node.start), self.visit(node.end))
+
+    def visit_Index(self, node):
+        return item(self.visit(node.value), self.visit(node.index))
+
+    def visit_Length(self, node):
+        return length(self.visit(node.value))
     
     def visit_Assign(self, node):
-        self.variables[node.name] = self.visit(node.value)
+        self.values[node.slot] = self.visit(node.value)
     
     def visit_Input(self, node):
-        input_value = input(f"Input value for {node.var_name}: ")
-        if input_value.isdigit():
-            return float(input_value)
-        else:
-            return input_value
+        return self.inputs.read(node.var_name)
     
     def visit_Print(self, node):
         value = self.visit(node.value)
-        print(value)
+        self.output.write(value)
         
     def visit_str(self, node):
         return node
@@ -117,5 +245,4 @@ class Interpreter:
         return node.value
 
     def visit_Statement(self, node):
-        for statement in node.statements:
-            self.visit(statement)
+        self.run_block(node)
@@ -1,7 +1,14 @@
+import re
+import sys
+
 class Token:
-    def __init__(self, type_, value):
+    __slots__ = ('type', 'value', 'line', 'column')
+
+    def __init__(self, type_, value, line=None, column=None):
         self.type = type_
         self.value = value
+        self.line = line
+        self.column = column
 
     def __str__(self):
         return f'Token({self.type}, {repr(self.value)})'
@@ -9,248 +16,330 @@ class Token:
     def __repr__(self):
         return self.__str__()
 
+OPERATOR_WORDS = {
+    'plus': '+',
+    'minus': '-',
+    'times': '*',
+    'divide': '/',
+}
+
+COMPARISON_LEXEMES = {
+    '=': '=',
+    '>=': '>=',
+    '=>': '>=',
+    '<=': '<=',
+    '=<': '<=',
+    '!=': '!=',
+    '>': '>',
+    '<': '<',
+}
+
+PUNCTUATION = {
+    '[': 'LBRACKET',
+    ']': 'RBRACKET',
+    ',': 'COMMA',
+}
+
+SPECIAL_WORDS = set(OPERATOR_WORDS) | {'output', 'input', 'is', 'repeat', 'if', 'otherwise'}
+
+# Matches a whole lexeme at once; the group that matched tells its kind.
+# Non-ASCII digits and letters fall back to the str predicates.
+LEXEME = re.compile(r'(\n)|(\s+)|([0-9]+(?:\.[0-9]*)?)|([A-Za-z][\w"]*)|([\[\],])')
+NEWLINE_LEXEME = 1
+SPACE_LEXEME = 2
+NUMBER_LEXEME = 3
+WORD_LEXEME = 4
+PUNCTUATION_LEXEME = 5
+
+INLINE_WHITESPACE = re.compile(r'[^\S\n]*\n?')
+ASCII_DIGITS = re.compile(r'[0-9]*')
+IDENTIFIER = re.compile(r'[\w"]*')
+COMPARISON = re.compile(r'>=|<=|=>|=<|!=|=(?= )|>|<')
+
+# Streaming lexers keep this many complete lines buffered past the current
+# token, enough for the longest statement header that spans lines
+LOOKAHEAD_LINES = 5
+STREAM_CHUNK_SIZE = 64 * 1024
+
 class Lexer:
-    def __init__(self, text):
+    def __init__(self, text, stream=None):
         self.text = text
         self.pos = 0
-        self.current_char = self.text[0] if text else None
-        self.line = 1
-        self.column = 1
         self.indent_level = 0
+        self.line_offset = 0
+        self.stream = iter(stream) if stream is not None else None
+        self.safe_end = len(text) if stream is None else 0
+        # Where locate() last counted up to, and the line it was on
+        self.mark = 0
+        self.mark_line = 1
+        self.line_start = 0
 
-    def error(self):
-        raise Exception(f'Invalid character "{self.current_char}" at line {self.line}, column {self.column}')
-
-    def advance(self):
-        if self.current_char == '\n':
-            self.line += 1
-            self.column = 0
-        self.pos += 1
-        self.column += 1
-        if self.pos > len(self.text) - 1:
-            self.current_char = None
-        else:
-            self.current_char = self.text[self.pos]
-
-    def skip_whitespace(self):
-        while self.current_char and self.current_char.isspace():
-            if self.current_char == '\n':
-                self.line += 1
-                self.column = 1
-                self.advance()
-                return Token('NEWLINE', '\n')
-            self.advance()
-        return None
-
-    def get_number(self):
-        result = ''
-        while self.current_char and self.current_char.isdigit():
-            result += self.current_char
-            self.advance()
-        
-        if self.current_char == '.':
-            result += self.current_char
-            self.advance()
-            
-            while self.current_char and self.current_char.isdigit():
-                result += self.current_char
-                self.advance()
-                
-        return float(result)
-
-    def get_identifier(self):
-        result = ''
-        while self.current_char and (self.current_char.isalnum() or self.current_char == '_' or self.current_char == '\"'):
-            result += self.current_char
-            self.advance()
-        return result
-
-    def get_comparison(self):
-        result = ''
-        if self.current_char == '=':
-            self.advance()
-            if self.current_char == ' ':
-                result = '='
-            elif self.current_char == '>':
-                result = '>='
-            elif self.current_char == '<':
-                result = '<='
-            else:
-                self.error()
-        elif self.current_char == '!':
-            self.advance()
-            if self.current_char == '=':
-                result = '!='
-            else:
-                self.error()
-        elif self.current_char == '>':
-            self.advance()
-            if self.current_char == '=':
-                result = '>='
-            else:
-                result = '>'
-        elif self.current_char == '<':
-            self.advance()
-            if self.current_char == '=':
-                result = '<='
-            else:
-                result = '<'
-        else:
-            self.error()
-            
-        return result
-
-    def parse_condition(self):
-        tokens = []
-        start_pos = self.pos
-        
-        # Parse first operand
-        if self.current_char.isdigit():
-            number = self.get_number()
-            tokens.append(Token('NUMBER', number))
-        elif self.current_char.isalpha():
-            identifier = self.get_identifier()
-            tokens.append(Token('IDENTIFIER', identifier))
+    @classmethod
+    def from_stream(cls, stream):
+        return cls('', stream)
+
+    def start_at(self, pos, line):
+        # Scans from pos, the start of `line`, instead of the beginning
+        self.pos = pos
+        self.mark = pos
+        self.mark_line = line
+        self.line_start = pos
+        return self
+
+    def refill(self, pos):
+        # Drops the lines before the one containing pos and reads more complete lines
+        text = self.text
+        cut = text.rfind('\n', 0, pos) + 1
+        self.line_offset += text.count('\n', 0, cut)
+        chunk = []
+        size = 0
+        for line in self.stream:
+            chunk.append(line)
+            size += len(line)
+            if size >= STREAM_CHUNK_SIZE and line.endswith('\n'):
+                break
         else:
-            self.pos = start_pos
-            self.current_char = self.text[self.pos]
-            raise Exception(f'Syntax Error: Expected number or identifier at line {self.line}, column {self.column}')
-        
-        self.skip_whitespace()
-        comparison = self.get_comparison()
-        
-        tokens.append(Token('COMPARISON', comparison))
-        
-        # Parse second operand
-        self.skip_whitespace()
-        if self.current_char.isdigit():
-            number = self.get_number()
-            tokens.append(Token('NUMBER', number))
-        elif self.current_char.isalpha():
-            identifier = self.get_identifier()
-            tokens.append(Token('IDENTIFIER', identifier))
+            self.stream = None
+        self.text = text = text[cut:] + ''.join(chunk)
+        self.mark = 0
+        self.mark_line = self.line_offset + 1
+        self.line_start = 0
+
+        if self.stream is None:
+            self.safe_end = len(text)
         else:
-            self.pos = start_pos
-            self.current_char = self.text[self.pos]
-            raise Exception(f'Syntax Error: Expected number or identifier after operator at line {self.line}, column {self.column}')
-        
-        return tokens
+            end = len(text)
+            for _ in range(LOOKAHEAD_LINES):
+                end = text.rfind('\n', 0, end)
+                if end == -1:
+                    break
+            self.safe_end = end + 1
+        return pos - cut
+
+    def position(self, pos):
+        line = self.line_offset + self.text.count('\n', 0, pos) + 1
+        column = pos - self.text.rfind('\n', 0, pos)
+        return line, column
+
+    def locate(self, pos):
+        # Same result as position(), counting on from the previous call
+        # since tokens are located in order
+        text = self.text
+        if pos < self.mark:
+            self.mark = 0
+            self.mark_line = self.line_offset + 1
+            self.line_start = 0
+        newlines = text.count('\n', self.mark, pos)
+        if newlines:
+            self.mark_line += newlines
+            self.line_start = text.rfind('\n', self.mark, pos) + 1
+        self.mark = pos
+        return self.mark_line, pos - self.line_start + 1
+
+    def error(self, pos):
+        char = self.text[pos] if pos < len(self.text) else None
+        line, column = self.position(pos)
+        raise Exception(f'Invalid character "{char}" at line {line}, column {column}')
+
+    def syntax_error(self, message, pos):
+        line, column = self.position(pos)
+        raise Exception(f'Syntax Error: {message} at line {line}, column {column}')
+
+    def skip_whitespace(self, pos):
+        # Skips spaces up to and including at most one newline
+        return INLINE_WHITESPACE.match(self.text, pos).end()
+
+    def digits_end(self, pos):
+        text = self.text
+        end = ASCII_DIGITS.match(text, pos).end()
+        while end < len(text) and text[end].isdigit():
+            end = ASCII_DIGITS.match(text, end + 1).end()
+        return end
+
+    def get_number(self, pos):
+        end = self.digits_end(pos)
+        if end < len(self.text) and self.text[end] == '.':
+            end = self.digits_end(end + 1)
+        return float(self.text[pos:end]), end
+
+    def get_identifier(self, pos):
+        end = IDENTIFIER.match(self.text, pos).end()
+        # Interned so that variable lookups compare names by identity
+        return sys.intern(self.text[pos:end]), end
+
+    def get_comparison(self, pos):
+        match = COMPARISON.match(self.text, pos)
+        if not match:
+            self.error(pos)
+        return COMPARISON_LEXEMES[match.group()], match.end()
+
+    def get_operand(self, pos, message):
+        char = self.text[pos] if pos < len(self.text) else ''
+        line, column = self.locate(pos)
+        if char.isdigit():
+            number, pos = self.get_number(pos)
+            return Token('NUMBER', number, line, column), pos
+        elif char.isalpha():
+            identifier, pos = self.get_identifier(pos)
+            return Token('IDENTIFIER', identifier, line, column), pos
+        self.syntax_error(message, pos)
+
+    def parse_condition(self, pos):
+        left, pos = self.get_operand(pos, 'Expected number or identifier')
+        pos = self.skip_whitespace(pos)
+        line, column = self.locate(pos)
+        comparison, pos = self.get_comparison(pos)
+        pos = self.skip_whitespace(pos)
+        right, pos = self.get_operand(pos, 'Expected number or identifier after operator')
+        return [left, Token('COMPARISON', comparison, line, column), right], pos
 
     def tokenize(self):
-        tokens = []
+        return list(self.scan())
+
+    def scan(self):
+        text = self.text
+        length = len(text)
+        pos = self.pos
+        safe_end = self.safe_end
         operator_count = 0
 
-        while self.current_char:
-            
-            if self.current_char.isspace() and self.current_char != '\n':
-                spaces = 0
-                while self.current_char and self.current_char.isspace():
-                    spaces += 1
-                    self.advance()
-                if self.column == spaces + 1:
-                    self.indent_level = spaces // 4
-                    if self.indent_level.is_integer() and self.indent_level > 0:
-                        tokens.append(Token('INDENT', self.indent_level))
-
-            if self.current_char.isspace():
-                newline_token = self.skip_whitespace()
-                if newline_token:
-                    tokens.append(newline_token)
-                    operator_count = 0  # Reset operator count on new line
+        while pos < length or self.stream is not None:
+            if pos >= safe_end and self.stream is not None:
+                pos = self.refill(pos)
+                text = self.text
+                length = len(text)
+                safe_end = self.safe_end
                 continue
 
-            if self.current_char.isdigit():
-                tokens.append(Token('NUMBER', self.get_number()))
+            match = LEXEME.match(text, pos)
+            kind = match.lastindex if match else None
+
+            if kind == NEWLINE_LEXEME:
+                line, column = self.locate(pos)
+                pos += 1
+                # The next line starts here, so locate() need not count it
+                self.mark = pos
+                self.mark_line = line + 1
+                self.line_start = pos
+                yield Token('NEWLINE', '\n', line, column)
+                operator_count = 0  # Reset operator count on new line
                 continue
 
-            if self.current_char.isalpha():
-                identifier = self.get_identifier()
-                if identifier in ['plus', 'minus', 'times', 'divide']:
-                    operator_count += 1
-                    if operator_count > 1:
-                        raise Exception(f'Syntax Error: Only one operator allowed per line (line {self.line}, column {self.column})')
-                    
-                    if identifier == 'plus':
-                        tokens.append(Token('OPERATOR', "+"))
-                    elif identifier == 'minus':
-                        tokens.append(Token('OPERATOR', "-"))
-                    elif identifier == 'times':
-                        tokens.append(Token('OPERATOR', "*"))
-                    elif identifier == 'divide':
-                        tokens.append(Token('OPERATOR', "/"))
-                elif identifier == 'output':
-                    tokens.append(Token('KEYWORD', 'print'))
-                    self.skip_whitespace()
-                    start_pos = self.pos
-                    if self.current_char == '\"':
-                        output = ''
-                        self.advance() 
-                        while self.current_char != '\"':
-                            if self.current_char == ' ':
-                                output += ' '
-                                self.advance()
-                            else:
-                                output += self.current_char
-                                self.advance()
-                        self.advance()
-                        tokens.append(Token('STRING', output))
-                    elif self.current_char.isdigit():
-                        output = self.get_number()
-                        tokens.append(Token('NUMBER', output))
-                elif identifier == 'input':
-                    tokens.append(Token('KEYWORD', 'input'))
-                elif identifier == 'is':
-                    self.skip_whitespace()
-                    start_pos = self.pos
-                    next_identifier = self.get_identifier()
-                    if next_identifier == 'now':
-                        tokens.append(Token('ASSIGN', '='))
-                    else:
-                        self.pos = start_pos
-                        self.current_char = self.text[self.pos]
-                        raise Exception(f'Syntax Error: Expected "now" after "is" at line {self.line}, column {self.column}')
-                elif identifier == 'repeat':
-                    self.skip_whitespace()
-                    start_pos = self.pos
-                    if self.current_char.isdigit() or self.current_char.isalpha():
-                        if self.current_char.isdigit():
-                            tokens.append(Token('KEYWORD', 'repeat'))
-                            number = self.get_number()
-                            tokens.append(Token('NUMBER', number))
-                            self.skip_whitespace()
-                            identifier = self.get_identifier()
-                            if identifier != 'times':
-                                self.pos = start_pos
-                                self.current_char = self.text[self.pos]
-                                raise Exception(f'Syntax Error: Expected "times" after number at line {self.line}, column {self.column}')
-                        elif self.current_char.isalpha():
-                            identifier = self.get_identifier()
-                            if identifier == 'until':
-                                tokens.append(Token('KEYWORD', 'until'))
-                                self.skip_whitespace()
-                                tokens.extend(self.parse_condition())
-                            else:
-                                tokens.append(Token('KEYWORD', 'repeat'))
-                                tokens.append(Token('IDENTIFIER', identifier))
-                                self.skip_whitespace()
-                                identifier = self.get_identifier()
-                                if identifier != 'times':
-                                    self.pos = start_pos
-                                    self.current_char = self.text[self.pos]
-                                    raise Exception(f'Syntax Error: Expected "times" after number at line {self.line}, column {self.column}')
-                elif identifier == 'if':
-                    tokens.append(Token('KEYWORD', 'if'))
-                    self.skip_whitespace()
-                    tokens.extend(self.parse_condition())
-                elif identifier == 'otherwise':
-                    tokens.append(Token('KEYWORD', 'else'))
+            if kind == SPACE_LEXEME:
+                end = match.end()
+                if end == length and self.stream is not None:
+                    safe_end = pos
+                    continue
+                # Only a run that starts a line and stays on it is indentation
+                if (pos == 0 or text[pos - 1] == '\n') and text.find('\n', pos, end) == -1:
+                    self.indent_level = (end - pos) // 4
+                    if self.indent_level > 0:
+                        yield Token('INDENT', self.indent_level, *self.locate(pos))
+                pos = end
+                continue
+
+            line, column = self.locate(pos)
+
+            if kind == NUMBER_LEXEME:
+                end = match.end()
+                if end < length and text[end] > '\x7f':
+                    number, pos = self.get_number(pos)
                 else:
-                    tokens.append(Token('IDENTIFIER', identifier))
+                    number, pos = float(match.group()), end
+                yield Token('NUMBER', number, line, column)
+                continue
+
+            if kind == PUNCTUATION_LEXEME:
+                char = match.group()
+                pos += 1
+                yield Token(PUNCTUATION[char], char, line, column)
+                continue
+
+            if kind == WORD_LEXEME:
+                identifier, pos = sys.intern(match.group()), match.end()
+            elif text[pos].isdigit():
+                number, pos = self.get_number(pos)
+                yield Token('NUMBER', number, line, column)
                 continue
+            elif text[pos].isalpha():
+                identifier, pos = self.get_identifier(pos)
+            else:
+                self.error(pos)
 
-            self.error()
+            if identifier not in SPECIAL_WORDS:
+                yield Token('IDENTIFIER', identifier, line, column)
+                continue
+
+            if identifier in OPERATOR_WORDS:
+                operator_count += 1
+                if operator_count > 1:
+                    line, column = self.position(pos)
+                    raise Exception(f'Syntax Error: Only one operator allowed per line (line {line}, column {column})')
+                yield Token('OPERATOR', OPERATOR_WORDS[identifier], line, column)
+            elif identifier == 'output':
+                yield Token('KEYWORD', 'print', line, column)
+                pos = self.skip_whitespace(pos)
+                char = text[pos] if pos < length else ''
+                line, column = self.locate(pos)
+                if char == '"':
+                    end = text.find('"', pos + 1)
+                    while end == -1 and self.stream is not None:
+                        pos = self.refill(pos)
+                        text = self.text
+                        length = len(text)
+                        safe_end = self.safe_end
+                        end = text.find('"', pos + 1)
+                    if end == -1:
+                        self.syntax_error('Unterminated string', pos)
+                    yield Token('STRING', text[pos + 1:end], line, column)
+                    pos = end + 1
+                elif char.isdigit():
+                    number, pos = self.get_number(pos)
+                    yield Token('NUMBER', number, line, column)
+            elif identifier == 'input':
+                yield Token('KEYWORD', 'input', line, column)
+            elif identifier == 'is':
+                pos = self.skip_whitespace(pos)
+                next_identifier, pos = self.get_identifier(pos)
+                if next_identifier != 'now':
+                    self.syntax_error('Expected "now" after "is"', pos)
+                yield Token('ASSIGN', '=', line, column)
+            elif identifier == 'repeat':
+                pos = self.skip_whitespace(pos)
+                char = text[pos] if pos < length else ''
+                if char.isdigit():
+                    yield Token('KEYWORD', 'repeat', line, column)
+                    line, column = self.locate(pos)
+                    number, pos = self.get_number(pos)
+                    yield Token('NUMBER', number, line, column)
+                    pos = self.skip_whitespace(pos)
+                    identifier, pos = self.get_identifier(pos)
+                    if identifier != 'times':
+                        self.syntax_error('Expected "times" after number', pos)
+                elif char.isalpha():
+                    start = pos
+                    identifier, pos = self.get_identifier(pos)
+                    if identifier == 'until':
+                        yield Token('KEYWORD', 'until', line, column)
+                        pos = self.skip_whitespace(pos)
+                        condition, pos = self.parse_condition(pos)
+                        yield from condition
+                    else:
+                        yield Token('KEYWORD', 'repeat', line, column)
+                        yield Token('IDENTIFIER', identifier, *self.locate(start))
+                        pos = self.skip_whitespace(pos)
+                        identifier, pos = self.get_identifier(pos)
+                        if identifier != 'times':
+                            self.syntax_error('Expected "times" after number', pos)
+            elif identifier == 'if':
+                yield Token('KEYWORD', 'if', line, column)
+                pos = self.skip_whitespace(pos)
+                condition, pos = self.parse_condition(pos)
+                yield from condition
+            elif identifier == 'otherwise':
+                yield Token('KEYWORD', 'else', line, column)
 
-        return tokens
+        self.pos = pos
 
 test_inputs = [
     # 'x is now input',
@@ -0,0 +1,148 @@
+import operator
+from array import array
+from itertools import repeat
+
+try:
+    # Vectorized arithmetic where NumPy is installed
+    import numpy
+except ImportError:
+    numpy = None
+
+BACKEND = 'numpy' if numpy is not None else 'array'
+
+ELEMENTWISE = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+}
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def storage(values):
+    if numpy is not None:
+        return numpy.array(values, dtype=float)
+    return array('d', values)
+
+def elementwise(op, left, right):
+    # Either side may be a plain number; the other is list storage
+    if numpy is not None:
+        return ELEMENTWISE[op](left, right)
+    function = ELEMENTWISE[op]
+    if not isinstance(left, array):
+        return array('d', map(function, repeat(left), right))
+    if not isinstance(right, array):
+        return array('d', map(function, left, repeat(right)))
+    return array('d', map(function, left, right))
+
+def has_zero(data):
+    if numpy is not None:
+        return not data.all()
+    return 0.0 in data
+
+class NumberList:
+    # A list of numbers that the arithmetic operators apply to element by
+    # element, backed by a NumPy array or else an array('d'). Operations with
+    # anything but numbers and other lists raise TypeError like str and float
+    # do, so every engine reports them the same way
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __str__(self):
+        # Built in one go, as the sinks write each value with one call
+        return '[' + ', '.join(map(repr, self.data.tolist())) + ']'
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        if not isinstance(other, NumberList):
+            return False
+        if numpy is not None:
+            return bool(numpy.array_equal(self.data, other.data))
+        return self.data == other.data
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def operate(self, op, other, reflected=False):
+        if isinstance(other, NumberList):
+            if len(other.data) != len(self.data):
+                raise Exception(f'Runtime Error: Lists of different lengths {len(self.data)} and {len(other.data)}')
+            other = other.data
+        elif not is_number(other):
+            return NotImplemented
+        left, right = (other, self.data) if reflected else (self.data, other)
+        if op == '/' and (right == 0 if is_number(right) else has_zero(right)):
+            raise Exception('Runtime Error: Division by zero')
+        return NumberList(elementwise(op, left, right))
+
+    def __add__(self, other):
+        return self.operate('+', other)
+
+    def __radd__(self, other):
+        return self.operate('+', other, True)
+
+    def __sub__(self, other):
+        return self.operate('-', other)
+
+    def __rsub__(self, other):
+        return self.operate('-', other, True)
+
+    def __mul__(self, other):
+        return self.operate('*', other)
+
+    def __rmul__(self, other):
+        return self.operate('*', other, True)
+
+    def __truediv__(self, other):
+        return self.operate('/', other)
+
+    def __rtruediv__(self, other):
+        return self.operate('/', other, True)
+
+def make_list(values):
+    for value in values:
+        if not is_number(value):
+            raise Exception(f'Runtime Error: Lists can only hold numbers, not {value}')
+    return NumberList(storage(values))
+
+def number_range(start, end):
+    # start, start + 1, ... up to and including end
+    if not is_number(start) or not is_number(end):
+        raise Exception(f'Runtime Error: Invalid range {start} to {end}')
+    try:
+        count = int(end - start) + 1 if end >= start else 0
+    except (OverflowError, ValueError):
+        raise Exception(f'Runtime Error: Invalid range {start} to {end}') from None
+    if numpy is not None:
+        data = numpy.arange(count, dtype=float)
+        if start:
+            data += start
+        return NumberList(data)
+    data = array('d', range(count))
+    if start:
+        data = elementwise('+', data, start)
+    return NumberList(data)
+
+def item(value, index):
+    if not isinstance(value, NumberList):
+        raise Exception(f'Runtime Error: Can only index lists, not {value}')
+    if not is_number(index) or not float(index).is_integer():
+        raise Exception(f'Runtime Error: List index must be a whole number, not {index}')
+    position = int(index)
+    if not 0 <= position < len(value.data):
+        raise Exception(f'Runtime Error: List index {position} out of range for a list of length {len(value.data)}')
+    return float(value.data[position])
+
+def length(value):
+    if not isinstance(value, (NumberList, str)):
+        raise Exception(f'Runtime Error: Can only take the length of a list or string, not {value}')
+    return float(len(value))
@@ -0,0 +1,124 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import shutil
+import tempfile
+from main import parse_program
+from server import start_server
+
+DEFAULT_PROGRAM = '''name is now input
+count is now input
+i is now 0
+repeat until i >= count
+    i is now i plus 1
+    output name
+output "done"
+'''
+
+def parse_args(argv):
+    arg_parser = argparse.ArgumentParser(usage='python loadtest.py [options] [filename.enl]')
+    arg_parser.add_argument('filename', nargs='?',
+                            help='program to serve in-process (default: a small input/output loop)')
+    arg_parser.add_argument('--connect', metavar='HOST:PORT',
+                            help='load an already running server instead of starting one')
+    arg_parser.add_argument('--unix', metavar='PATH',
+                            help='load an already running server on a Unix socket')
+    arg_parser.add_argument('--sessions', type=int, default=2000,
+                            help='total number of sessions to run (default: 2000)')
+    arg_parser.add_argument('--concurrency', type=int, default=200,
+                            help='sessions open at the same time (default: 200)')
+    arg_parser.add_argument('--input', action='append', dest='inputs', metavar='VALUE',
+                            help='line to send for each input; repeat for several (default: "ada", "3")')
+    return arg_parser.parse_args(argv)
+
+async def session(connect, payload):
+    start = time.perf_counter()
+    reader, writer = await connect()
+    writer.write(payload)
+    await writer.drain()
+    received = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return time.perf_counter() - start, received
+
+async def load(connect, sessions, concurrency, payload):
+    # Keeps `concurrency` sessions in flight until `sessions` have finished
+    latencies = []
+    errors = 0
+    remaining = iter(range(sessions))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            try:
+                latency, received = await session(connect, payload)
+            except OSError:
+                errors += 1
+                continue
+            if b'Error' in received:
+                errors += 1
+            latencies.append(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, errors
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def run(args):
+    inputs = args.inputs if args.inputs is not None else ['ada', '3']
+    payload = ''.join(f'{value}\n' for value in inputs).encode('utf-8')
+
+    server = None
+    directory = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        connect = lambda: asyncio.open_connection(host, int(port))
+    elif args.unix:
+        connect = lambda: asyncio.open_unix_connection(args.unix)
+    else:
+        # Serve in-process on a Unix socket, or an ephemeral TCP port
+        if args.filename:
+            with open(args.filename, 'r') as file:
+                source = file.read()
+        else:
+            source = DEFAULT_PROGRAM
+        ast = parse_program(source)
+        if hasattr(asyncio, 'start_unix_server'):
+            directory = tempfile.mkdtemp()
+            path = os.path.join(directory, 'enlang.sock')
+            server = await start_server(ast, unix=path)
+            connect = lambda: asyncio.open_unix_connection(path)
+        else:
+            server = await start_server(ast, port=0)
+            port = server.sockets[0].getsockname()[1]
+            connect = lambda: asyncio.open_connection('127.0.0.1', port)
+
+    try:
+        elapsed, latencies, errors = await load(connect, args.sessions, args.concurrency, payload)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"sessions:     {len(latencies)} ({errors} with errors)")
+    print(f"concurrency:  {args.concurrency}")
+    print(f"elapsed:      {elapsed:.3f}s")
+    print(f"sessions/sec: {len(latencies) / elapsed:.1f}")
+    print(f"latency p50:  {percentile(latencies, 0.5) * 1000:.2f}ms")
+    print(f"latency p99:  {percentile(latencies, 0.99) * 1000:.2f}ms")
+
+def main():
+    args = parse_args(sys.argv[1:])
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import math
+from fractions import Fraction
+from interpreter import COMPARISONS, OPERATORS
+from parser import Assign, BinOp, Number, String, Variable
+from closures import ClosureCompiler
+from resolver import SlotView
+from lists import NumberList, is_number
+
+# Floats add exactly while every partial sum fits in the 53-bit mantissa
+EXACT_LIMIT = 2 ** 53
+
+FLIPPED = {
+    '=': '=',
+    '==': '=',
+    '!=': '!=',
+    '>': '<',
+    '<': '>',
+    '>=': '<=',
+    '<=': '>=',
+}
+
+def is_term(node):
+    return isinstance(node, (Number, String, Variable))
+
+def is_pure(node):
+    if isinstance(node, BinOp):
+        return is_term(node.left) and is_term(node.right)
+    return is_term(node)
+
+def iterations(start, step, op, bound):
+    # Smallest k >= 0 for which `start + k * step <op> bound` holds, or None
+    if COMPARISONS[op](start, bound):
+        return 0
+    if step == 0:
+        return None
+    try:
+        target = (Fraction(bound) - Fraction(start)) / Fraction(step)
+    except (OverflowError, ValueError):
+        return None
+
+    if op in ('>', '>=') and step < 0 or op in ('<', '<=') and step > 0:
+        return None
+    if op in ('>', '<'):
+        return math.floor(target) + 1
+    if op in ('>=', '<='):
+        return math.ceil(target)
+    if op in ('=', '=='):
+        if target.denominator == 1 and target > 0:
+            return int(target)
+        return None
+    if op == '!=':
+        return 1
+    return None
+
+def advance(start, step, count):
+    # start + step added count times, or None if float rounding could differ
+    if isinstance(start, int) and isinstance(step, int):
+        return start + step * count
+    try:
+        start_exact = Fraction(start)
+        step_exact = Fraction(step)
+    except (OverflowError, ValueError):
+        return None
+    scale = max(start_exact.denominator, step_exact.denominator)
+    end_exact = start_exact + step_exact * count
+    if abs(start_exact * scale) > EXACT_LIMIT or abs(end_exact * scale) > EXACT_LIMIT:
+        return None
+    return float(end_exact)
+
+class LoopPlan:
+    def __init__(self, node, slots):
+        self.node = node
+        self.slots = slots
+        self.variables = SlotView(slots)
+        self.counter = None
+        self.op = None
+        self.bound = None
+        self.steps = None
+        self.tight_loop = None
+
+    @classmethod
+    def analyze(cls, node, slots):
+        # Only loops whose body is plain assignments without input qualify
+        body = node.body.statements
+        if not body or not all(isinstance(statement, Assign) and is_pure(statement.value) for statement in body):
+            return None
+        plan = cls(node, slots)
+
+        assigned = [statement.name for statement in body]
+        def invariant(term):
+            return isinstance(term, (Number, String)) or (isinstance(term, Variable) and term.name not in assigned)
+
+        if isinstance(node.left, Variable) and invariant(node.right):
+            plan.counter, plan.op, plan.bound = node.left.name, node.op, node.right
+        elif isinstance(node.right, Variable) and invariant(node.left):
+            plan.counter, plan.op, plan.bound = node.right.name, FLIPPED[node.op], node.left
+        else:
+            return plan
+
+        if len(set(assigned)) != len(assigned):
+            return plan
+        steps = []
+        for statement in body:
+            value = statement.value
+            if isinstance(value, BinOp) and value.op in ('+', '-') and \
+                    isinstance(value.left, Variable) and value.left.name == statement.name and invariant(value.right):
+                steps.append((statement.name, 'step', value.op, value.right))
+            elif isinstance(value, BinOp) and value.op == '+' and \
+                    isinstance(value.right, Variable) and value.right.name == statement.name and invariant(value.left):
+                steps.append((statement.name, 'step', value.op, value.left))
+            elif is_term(value) and invariant(value) or \
+                    isinstance(value, BinOp) and invariant(value.left) and invariant(value.right):
+                steps.append((statement.name, 'set', None, value))
+            else:
+                return plan
+        if any(name == plan.counter and kind == 'step' for name, kind, _, _ in steps):
+            plan.steps = steps
+        return plan
+
+    def value(self, term):
+        if isinstance(term, Variable):
+            return self.variables[term.name]
+        return term.value
+
+    def evaluate(self, node):
+        if not isinstance(node, BinOp):
+            return self.value(node)
+        left = self.value(node.left)
+        right = self.value(node.right)
+        if isinstance(left, NumberList) or isinstance(right, NumberList):
+            # List errors must only come from iterations that actually run
+            raise TypeError
+        if node.op == '/' and right == 0:
+            raise ZeroDivisionError
+        return OPERATORS[node.op](left, right)
+
+    def run(self):
+        if not self.run_closed_form():
+            self.run_tight()
+
+    def run_closed_form(self):
+        # Computes the state after the loop directly; False means the normal
+        # loop has to run, either to stay exact or to raise the usual error
+        if self.steps is None:
+            return False
+        try:
+            bound = self.value(self.bound)
+            updates = {}
+            deltas = {}
+            for name, kind, op, operand in self.steps:
+                if kind == 'step':
+                    start = self.variables[name]
+                    delta = self.value(operand)
+                    if not is_number(start) or not is_number(delta):
+                        return False
+                    deltas[name] = (start, delta if op == '+' else -delta)
+                else:
+                    updates[name] = self.evaluate(operand)
+        except (KeyError, TypeError, ZeroDivisionError):
+            return False
+
+        start, step = deltas[self.counter]
+        if not is_number(bound):
+            return False
+        count = iterations(start, step, self.op, bound)
+        if count is None:
+            return False
+        if count == 0:
+            return True
+
+        for name, (start, step) in deltas.items():
+            final = advance(start, step, count)
+            if final is None:
+                return False
+            updates[name] = final
+        self.variables.update(updates)
+        return True
+
+    def run_tight(self):
+        if self.tight_loop is None:
+            self.tight_loop = ClosureCompiler(self.slots, closed_form_loops=False).compile(self.node)
+        self.tight_loop()
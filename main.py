@@ -1,47 +1,391 @@
 import sys
 import os
+import time
+import argparse
 from lexer import Lexer
-from parser import Parser
+from parser import Parser, Statement
 from interpreter import Interpreter
+from closures import ClosureInterpreter
+from transpiler import Transpiler, PythonInterpreter
+from bytecode import VMInterpreter
+from optimizer import Optimizer
+from cache import ProgramCache, DEFAULT_MAX_SIZE
+from sinks import StdoutSink, FileSink, DEFAULT_BUFFER_SIZE
+from inputs import FileInput, StreamInput, read_lines
+from profiler import ProfilingInterpreter
+from instrument import Instrumentation, NO_INSTRUMENTATION
+from incremental import IncrementalFrontEnd
+from flat import FlatProgram, FlatInterpreter
+from resolver import SlotTable, Resolver
+from analyzer import Analyzer
+
+# Seconds between checks of a watched script for changes
+WATCH_INTERVAL = 0.2
+
+ENGINES = {
+    'tree': Interpreter,
+    'closure': ClosureInterpreter,
+    'python': PythonInterpreter,
+    'vm': VMInterpreter,
+    'flat': FlatInterpreter,
+}
+
+# Extension of programs saved with --compile
+COMPILED_EXTENSION = '.enlf'
+
+def parse_program(source_code, cache=None, instrumentation=NO_INSTRUMENTATION):
+    # Reuse the tree from a previous run of the same source if possible
+    if cache is not None:
+        with instrumentation.phase('cache'):
+            ast = cache.load(source_code)
+        if ast is not None:
+            instrumentation.count_nodes(ast)
+            return ast
 
-def run_program(source_code):
     # Create lexer instance
-    lexer = Lexer(source_code)
-    tokens = lexer.tokenize()
-    # return tokens
-    
+    with instrumentation.phase('lex'):
+        lexer = Lexer(source_code)
+        tokens = lexer.tokenize()
+    instrumentation.count('tokens', len(tokens))
+
     # Create parser instance
-    parser = Parser(tokens)
-    ast = parser.parse()
-    # return ast
-    
+    with instrumentation.phase('parse'):
+        parser = Parser(tokens)
+        ast = parser.parse()
+    instrumentation.count_nodes(ast)
+
+    if cache is not None:
+        with instrumentation.phase('store'):
+            cache.store(source_code, ast)
+    return ast
+
+def run_program(source_code, engine='tree', cache=None, optimize=False, output=None, inputs=None,
+                instrumentation=NO_INSTRUMENTATION, report=None):
+    # Pass an Instrumentation to time each phase of the run, and a stream as
+    # `report` to get the errors found before the program runs
+    ast = parse_program(source_code, cache, instrumentation)
+    if optimize:
+        with instrumentation.phase('optimize'):
+            ast = Optimizer().optimize(ast)
+
     # Create interpreter instance
-    interpreter = Interpreter(ast)
-    result = interpreter.interpret()
+    with instrumentation.phase('setup'):
+        interpreter = ENGINES[engine](ast, output, inputs)
+    if report is not None:
+        for problem in interpreter.problems:
+            report.write(f'Warning: {problem}\n')
+    instrumentation.attach(interpreter)
+    with instrumentation.phase('execute'):
+        result = interpreter.interpret()
     return result
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python main.py <filename.enl>")
+def check_program(source_code, optimize=False):
+    # Errors certain to happen when their line runs, without running anything
+    ast = parse_program(source_code)
+    if optimize:
+        ast = Optimizer().optimize(ast)
+    slots = SlotTable()
+    Resolver(slots).resolve(ast)
+    return Analyzer(slots).analyze(ast)
+
+def compile_to_file(source_code, path, optimize=False):
+    # Saves the program as flat arrays that run_compiled maps back in
+    ast = parse_program(source_code)
+    if optimize:
+        ast = Optimizer().optimize(ast)
+    FlatProgram.from_ast(ast).save(path)
+
+def run_compiled(path, output=None, inputs=None, instrumentation=NO_INSTRUMENTATION):
+    # Runs a program saved with --compile on the flat engine, which walks
+    # the memory-mapped arrays without rebuilding the tree
+    with instrumentation.phase('load'):
+        program = FlatProgram.load(path)
+    instrumentation.count('nodes', len(program))
+    with instrumentation.phase('setup'):
+        interpreter = FlatInterpreter(program, output, inputs)
+    with instrumentation.phase('execute'):
+        return interpreter.interpret()
+
+def create_profiler(source_code, optimize=False, output=None, inputs=None):
+    # Profiling always uses the profiling tree walker, whatever engine was chosen
+    ast = parse_program(source_code)
+    if optimize:
+        ast = Optimizer().optimize(ast)
+    return ProfilingInterpreter(ast, output, inputs)
+
+def write_profile(profiler, args, source_code, filename):
+    source_lines = source_code.split('\n')
+    if args.profile:
+        report = profiler.report(source_lines)
+        if args.profile_output:
+            with open(args.profile_output, 'w') as file:
+                file.write(report)
+        else:
+            sys.stderr.write(report)
+    if args.flamegraph:
+        with open(args.flamegraph, 'w') as file:
+            file.write(profiler.collapsed_stacks(source_lines, os.path.basename(filename)))
+
+def run_stream(stream, engine='tree', optimize=False, output=None, inputs=None,
+               instrumentation=NO_INSTRUMENTATION):
+    # Lexes, parses and runs the program one top-level statement at a time,
+    # so output starts before the whole file has been read. The phases
+    # interleave, so they are measured as one
+    lexer = Lexer.from_stream(stream)
+    parser = Parser(lexer.scan())
+    interpreter = ENGINES[engine](Statement([]), output, inputs)
+    instrumentation.attach(interpreter)
+    optimizer = Optimizer() if optimize else None
+    try:
+        with instrumentation.phase('stream'):
+            for statement in parser.statements():
+                if optimizer is None:
+                    interpreter.execute(statement)
+                    continue
+                for optimized in optimizer.optimize_statement(statement):
+                    interpreter.execute(optimized)
+    finally:
+        interpreter.output.flush()
+
+def watch(filename, args, interval=WATCH_INTERVAL):
+    # Re-runs the script every time it is saved. The front end is kept
+    # between runs, so only the edited lines are lexed and parsed again
+    front_end = IncrementalFrontEnd()
+    modified = None
+    print(f"Watching {filename} for changes, press Ctrl+C to stop...")
+    try:
+        while True:
+            try:
+                stamp = os.stat(filename).st_mtime_ns
+            except OSError:
+                stamp = None
+            if stamp is not None and stamp != modified:
+                modified = stamp
+                run_watched(front_end, filename, args)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+def run_watched(front_end, filename, args):
+    output = None
+    try:
+        with open(filename, 'r') as file:
+            content = file.read()
+        start = time.perf_counter()
+        ast = front_end.update(content)
+        elapsed = time.perf_counter() - start
+        sys.stderr.write(f"--- {filename}: front end {elapsed * 1000:.3f}ms, {front_end.relexed_lines} lines lexed, "
+                         f"{front_end.reparsed_statements} statements parsed\n")
+        if args.optimize:
+            ast = Optimizer().optimize(ast)
+        output = open_output(args)
+        ENGINES[args.engine](ast, output, open_inputs(args)).interpret()
+    except Exception as e:
+        print(f"Error processing file: {str(e)}")
+    finally:
+        if output is not None:
+            output.close()
+
+def open_output(args):
+    if args.output:
+        return FileSink(args.output, args.buffer_size, args.line_buffered)
+    return StdoutSink(args.buffer_size, True if args.line_buffered else None)
+
+def open_inputs(args):
+    # Values for `input` come from a file, or from stdin with "-", without prompting
+    if args.inputs is None:
+        return None
+    if args.inputs == '-':
+        return StreamInput(sys.stdin)
+    return FileInput(args.inputs)
+
+def parse_args(argv):
+    arg_parser = argparse.ArgumentParser(usage='python main.py [options] <filename.enl>\n'
+                                               '       python main.py --batch PATH [PATH ...] [options]\n'
+                                               '       python main.py [options]   (interactive session)')
+    arg_parser.add_argument('filename', nargs='?')
+    arg_parser.add_argument('--engine', choices=sorted(ENGINES), default='tree',
+                            help='execution engine to run the program with (default: tree)')
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help='fold constants and remove dead branches before running')
+    arg_parser.add_argument('--compile', metavar='FILE',
+                            help=f'save the program to FILE in the compiled {COMPILED_EXTENSION} format instead of running it')
+    arg_parser.add_argument('--check', action='store_true',
+                            help='report errors that are certain to happen when their line runs, without running the program')
+    arg_parser.add_argument('--dump-python', action='store_true',
+                            help='print the Python source the program transpiles to instead of running it')
+    arg_parser.add_argument('--stream', action='store_true',
+                            help='run each top-level statement as soon as it is parsed (bypasses the cache)')
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help='do not read or write the compiled program cache')
+    arg_parser.add_argument('--cache-dir',
+                            help='directory for the compiled program cache (default: __enlcache__ next to the script)')
+    arg_parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_SIZE,
+                            help='maximum size of the compiled program cache in bytes')
+    arg_parser.add_argument('--watch', action='store_true',
+                            help='run the program again every time the file is saved')
+    arg_parser.add_argument('--output', metavar='FILE',
+                            help='write the output of the program to FILE instead of stdout')
+    arg_parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE,
+                            help='characters of output to collect before writing them out (0 writes every line)')
+    arg_parser.add_argument('--line-buffered', action='store_true',
+                            help='write every output line immediately (default when stdout is a terminal)')
+    arg_parser.add_argument('--inputs', metavar='FILE',
+                            help='read values for input one per line from FILE ("-" for stdin) instead of prompting')
+    profiling = arg_parser.add_argument_group('profiling')
+    profiling.add_argument('--profile', action='store_true',
+                           help='report hits, iterations and time per source line to stderr')
+    profiling.add_argument('--profile-output', metavar='FILE',
+                           help='write the --profile report to FILE instead of stderr')
+    profiling.add_argument('--flamegraph', metavar='FILE',
+                           help='write collapsed stacks of source lines to FILE for flamegraph tools')
+    instrumentation = arg_parser.add_argument_group('instrumentation')
+    instrumentation.add_argument('--timings', action='store_true',
+                                 help='report wall and CPU time of each phase and token, node and dispatch counts to stderr')
+    instrumentation.add_argument('--memory', action='store_true',
+                                 help='also report the tracemalloc peak of each phase (implies --timings)')
+    instrumentation.add_argument('--timings-output', metavar='FILE',
+                                 help='write the --timings report to FILE as JSON instead of stderr')
+    batch = arg_parser.add_argument_group('batch mode')
+    batch.add_argument('--batch', nargs='+', metavar='PATH', default=[],
+                       help='run every .enl file in these directories, glob patterns or files in parallel (patterns and files may also be .enlf)')
+    batch.add_argument('--manifest', metavar='FILE',
+                       help='also run the files listed one per line in FILE (implies --batch)')
+    batch.add_argument('--jobs', type=int,
+                       help='number of worker processes (default: one per core)')
+    batch.add_argument('--timeout', type=float,
+                       help='seconds each program may run before it is stopped')
+    batch.add_argument('--summary', metavar='FILE',
+                       help='write the JSON lines summary to FILE instead of stdout')
+    return arg_parser.parse_args(argv)
+
+def dump_python(source_code, optimize=False):
+    ast = parse_program(source_code)
+    if optimize:
+        ast = Optimizer().optimize(ast)
+    return Transpiler(ast).transpile()
+
+def main_batch(args):
+    # Imported here because the workers import this module in turn
+    from batch import find_programs, run_batch
+    targets = args.batch + ([args.filename] if args.filename else [])
+    try:
+        programs = find_programs(targets, args.manifest)
+    except OSError as e:
+        print(f"Error: {e}")
         sys.exit(1)
+    inputs = args.inputs
+    if inputs == '-':
+        # Workers cannot share stdin, so its values are read once here and
+        # every program gets the same ones
+        inputs = read_lines(sys.stdin)
+    options = {
+        'engine': args.engine,
+        'optimize': args.optimize,
+        'timeout': args.timeout,
+        'inputs': inputs,
+        'no_cache': args.no_cache,
+        'cache_dir': args.cache_dir,
+        'cache_size': args.cache_size,
+    }
+    failures = run_batch(programs, options, jobs=args.jobs, summary=args.summary)
+    if failures:
+        sys.exit(1)
+
+def main_repl(args):
+    # Imported here so running a file does not load line editing
+    from repl import Repl
+    output = StdoutSink(args.buffer_size, True)
+    Repl(ENGINES[args.engine], args.optimize, output, open_inputs(args)).run()
 
-    filename = sys.argv[1]
-    if not filename.endswith('.enl'):
-        print("Error: File must have .enl extension")
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.batch or args.manifest is not None:
+        main_batch(args)
+        return
+    if args.filename is None:
+        main_repl(args)
+        return
+
+    filename = args.filename
+    compiled = filename.endswith(COMPILED_EXTENSION)
+    if not filename.endswith('.enl') and not compiled:
+        print(f"Error: File must have .enl or {COMPILED_EXTENSION} extension")
         sys.exit(1)
 
     if not os.path.exists(filename):
         print(f"Error: File '{filename}' not found")
         sys.exit(1)
 
+    if compiled and (args.watch or args.stream or args.compile or args.check or args.dump_python or args.profile or args.flamegraph):
+        print(f"Error: {COMPILED_EXTENSION} files can only be run; use the .enl source for that option")
+        sys.exit(1)
+
+    if args.watch:
+        watch(filename, args)
+        return
+
+    output = None
+    instrumentation = NO_INSTRUMENTATION
+    if args.timings or args.memory or args.timings_output:
+        instrumentation = Instrumentation(memory=args.memory)
     try:
+        if compiled:
+            print(f"Processing {filename}...")
+            output = open_output(args)
+            run_compiled(filename, output, open_inputs(args), instrumentation)
+            return
         with open(filename, 'r') as file:
-            content = file.read()
+            if args.compile:
+                compile_to_file(file.read(), args.compile, optimize=args.optimize)
+                print(f"Compiled {filename} to {args.compile}")
+                return
+            if args.check:
+                problems = check_program(file.read(), optimize=args.optimize)
+                for problem in problems:
+                    print(f"{filename}: {problem}")
+                if problems:
+                    sys.exit(1)
+                print(f"No problems found in {filename}")
+                return
+            if args.dump_python:
+                print(dump_python(file.read(), optimize=args.optimize), end='')
+                return
             print(f"Processing {filename}...")
-            result = run_program(content)
+            output = open_output(args)
+            inputs = open_inputs(args)
+            if args.stream:
+                run_stream(file, engine=args.engine, optimize=args.optimize, output=output, inputs=inputs,
+                           instrumentation=instrumentation)
+                return
+            with instrumentation.phase('read'):
+                content = file.read()
+            if args.profile or args.flamegraph:
+                profiler = create_profiler(content, optimize=args.optimize, output=output, inputs=inputs)
+                try:
+                    profiler.interpret()
+                finally:
+                    # Also profile runs that stop with an error
+                    write_profile(profiler, args, content, filename)
+                return
+            if args.no_cache:
+                cache = None
+            elif args.cache_dir:
+                cache = ProgramCache(args.cache_dir, args.cache_size)
+            else:
+                cache = ProgramCache.for_script(filename, args.cache_size)
+            result = run_program(content, engine=args.engine, cache=cache, optimize=args.optimize, output=output, inputs=inputs,
+                                 instrumentation=instrumentation, report=sys.stderr)
     except Exception as e:
         print(f"Error processing file: {str(e)}")
         sys.exit(1)
+    finally:
+        if output is not None:
+            output.close()
+        # Also report runs that stop with an error
+        if instrumentation is not NO_INSTRUMENTATION:
+            instrumentation.finish()
+            instrumentation.write(args.timings_output)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,171 @@
+from interpreter import COMPARISONS, OPERATORS
+from parser import (Statement, BinOp, Assign, Number, String, Variable, Print,
+                    If, Else, IfBlock, ForBlock, WhileBlock)
+
+def is_literal(node):
+    return isinstance(node, (Number, String))
+
+def literal(value):
+    if isinstance(value, str):
+        return String(value)
+    return Number(value)
+
+def located(node, original):
+    # Rewritten nodes keep the source position of the node they replace
+    if hasattr(original, 'line'):
+        node.line = original.line
+        node.column = original.column
+    return node
+
+def assigned_names(node):
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Assign):
+            names.add(node.name)
+        elif isinstance(node, Statement):
+            stack.extend(node.statements)
+        elif isinstance(node, Else):
+            stack.append(node.body)
+        elif isinstance(node, IfBlock):
+            stack.append(node.body)
+            if node.else_body:
+                stack.append(node.else_body)
+        elif isinstance(node, (ForBlock, WhileBlock)):
+            stack.append(node.body)
+    return names
+
+class Optimizer:
+    def __init__(self):
+        # Blocks are rewritten by generators that yield each body they need
+        # optimized and are sent the result, so visit can walk them with an
+        # explicit stack and nesting depth is not limited by the recursion limit
+        self.blocks = {
+            Statement: self.block_Statement,
+            Else: self.block_Else,
+            IfBlock: self.block_IfBlock,
+            ForBlock: self.block_ForBlock,
+            WhileBlock: self.block_WhileBlock,
+        }
+
+    def optimize(self, ast):
+        return self.visit(ast)
+
+    def optimize_statement(self, node):
+        # A top-level statement may fold away entirely or into several statements
+        result = self.visit(node)
+        if result is None:
+            return []
+        if isinstance(result, list):
+            return result
+        return [result]
+
+    def visit(self, node):
+        blocks = self.blocks
+        block = blocks.get(type(node))
+        if block is None:
+            method_name = f'visit_{type(node).__name__}'
+            visitor = getattr(self, method_name, None)
+            if visitor is None:
+                return node
+            return visitor(node)
+        stack = [block(node)]
+        result = None
+        while stack:
+            try:
+                child = stack[-1].send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+                continue
+            block = blocks.get(type(child))
+            if block is None:
+                result = self.visit(child)
+            else:
+                stack.append(block(child))
+                result = None
+        return result
+
+    def block_Statement(self, node):
+        statements = []
+        for statement in node.statements:
+            # A statement may fold away entirely or into several statements
+            result = yield statement
+            if isinstance(result, list):
+                statements.extend(result)
+            elif result is not None:
+                statements.append(result)
+        return Statement(statements)
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if is_literal(left) and is_literal(right) and node.op in OPERATORS:
+            # Division by a literal zero must still fail when the line runs
+            if not (node.op == '/' and right.value == 0):
+                try:
+                    return located(literal(OPERATORS[node.op](left.value, right.value)), node)
+                except TypeError:
+                    pass
+        return located(BinOp(left, node.op, right), node)
+
+    def visit_Assign(self, node):
+        return located(Assign(node.name, self.visit(node.value)), node)
+
+    def visit_Print(self, node):
+        return located(Print(self.visit(node.value)), node)
+
+    def visit_If(self, node):
+        return located(If(self.visit(node.left), node.op, self.visit(node.right)), node)
+
+    def block_Else(self, node):
+        body = yield node.body
+        return located(Else(body), node)
+
+    def block_IfBlock(self, node):
+        condition = self.visit(node.condition)
+        if is_literal(condition.left) and is_literal(condition.right):
+            try:
+                taken = COMPARISONS[condition.op](condition.left.value, condition.right.value)
+            except TypeError:
+                taken = None
+            if taken is not None:
+                if taken:
+                    return (yield node.body).statements
+                if node.else_body:
+                    return (yield node.else_body.body).statements
+                return None
+
+        body = yield node.body
+        else_body = (yield node.else_body) if node.else_body else None
+        return located(IfBlock(condition, body, else_body), node)
+
+    def block_ForBlock(self, node):
+        count = self.visit(node.count)
+        if isinstance(count, Number):
+            try:
+                if int(count.value) <= 0:
+                    return None
+            except (OverflowError, ValueError):
+                pass
+        body = yield node.body
+        return located(ForBlock(count, body), node)
+
+    def block_WhileBlock(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        body = yield node.body
+
+        assigned = assigned_names(body)
+        invariant = all(
+            is_literal(operand) or (isinstance(operand, Variable) and operand.name not in assigned)
+            for operand in (left, right)
+        )
+        if invariant and is_literal(left) and is_literal(right):
+            try:
+                if COMPARISONS[node.op](left.value, right.value):
+                    return None
+            except TypeError:
+                pass
+        return located(WhileBlock(left, node.op, right, body, invariant=invariant), node)
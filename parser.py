@@ -1,10 +1,16 @@
 from lexer import Token, Lexer
 
 class AST:
+    # Source position of the token the node starts at; nodes built outside
+    # the parser may have none
+    __slots__ = ('line', 'column')
+
     def __str__(self, indent=0):
         return '  ' * indent + self.__class__.__name__
 
 class Statement(AST):
+    __slots__ = ('statements',)
+
     def __init__(self, statements):
         self.statements = statements
     
@@ -18,10 +24,15 @@ class Statement(AST):
         return self.__str__()
 
 class BinOp(AST):
+    __slots__ = ('left', 'op', 'right', 'checked')
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
+        # Cleared by the analyzer when the operation cannot fail a type or
+        # zero divisor check
+        self.checked = True
     
     def __str__(self, indent=0):
         result = '  ' * indent + 'BinOp:\n'
@@ -34,6 +45,8 @@ class BinOp(AST):
         return self.__str__()
     
 class Keyword(AST):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
     
@@ -44,8 +57,11 @@ class Keyword(AST):
         return self.__str__()
 
 class Assign(AST):
+    __slots__ = ('name', 'value', 'slot')
+
     def __init__(self, name, value):
         self.name = name
+        self.slot = None
         if name.isdecimal():
             raise Exception(f"Syntax Error: Invalid variable name '{name}'. Variable names must start with a letter.")
         self.value = value
@@ -60,6 +76,8 @@ class Assign(AST):
         return self.__str__()
 
 class Number(AST):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
     
@@ -70,6 +88,8 @@ class Number(AST):
         return self.__str__()
     
 class String(AST):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
     
@@ -80,8 +100,14 @@ class String(AST):
         return self.__str__()
 
 class Variable(AST):
+    __slots__ = ('name', 'slot', 'checked')
+
     def __init__(self, name):
         self.name = name
+        # Filled in by the resolver with the variable's index in the slot table
+        self.slot = None
+        # Cleared by the analyzer where the variable is certain to be defined
+        self.checked = True
     
     def __str__(self, indent=0):
         return '  ' * indent + f'Variable({self.name})'
@@ -89,7 +115,70 @@ class Variable(AST):
     def __repr__(self):
         return self.__str__()
 
+class ListLiteral(AST):
+    __slots__ = ('elements',)
+
+    def __init__(self, elements):
+        self.elements = elements
+    
+    def __str__(self, indent=0):
+        result = '  ' * indent + 'ListLiteral:'
+        for element in self.elements:
+            result += '\n' + element.__str__(indent + 1)
+        return result
+    
+    def __repr__(self):
+        return self.__str__()
+
+class Range(AST):
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+    
+    def __str__(self, indent=0):
+        result = '  ' * indent + 'Range:\n'
+        result += self.start.__str__(indent + 1) + '\n'
+        result += self.end.__str__(indent + 1)
+        return result
+    
+    def __repr__(self):
+        return self.__str__()
+
+class Index(AST):
+    __slots__ = ('value', 'index')
+
+    def __init__(self, value, index):
+        self.value = value
+        self.index = index
+    
+    def __str__(self, indent=0):
+        result = '  ' * indent + 'Index:\n'
+        result += self.value.__str__(indent + 1) + '\n'
+        result += self.index.__str__(indent + 1)
+        return result
+    
+    def __repr__(self):
+        return self.__str__()
+
+class Length(AST):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+    
+    def __str__(self, indent=0):
+        result = '  ' * indent + 'Length:\n'
+        result += self.value.__str__(indent + 1)
+        return result
+    
+    def __repr__(self):
+        return self.__str__()
+
 class Print(AST):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
     
@@ -102,6 +191,8 @@ class Print(AST):
         return self.__str__()
     
 class Input(AST):
+    __slots__ = ('var_name',)
+
     def __init__(self, var_name):
         self.var_name = var_name
     
@@ -114,6 +205,8 @@ class Input(AST):
         return self.__str__()
     
 class If(AST):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
@@ -130,6 +223,8 @@ class If(AST):
         return self.__str__()
 
 class Else(AST):
+    __slots__ = ('body',)
+
     def __init__(self, body):
         self.body = body
     
@@ -142,6 +237,8 @@ class Else(AST):
         return self.__str__()
 
 class IfBlock(AST):
+    __slots__ = ('condition', 'body', 'else_body')
+
     def __init__(self, condition, body, else_body=None):
         self.condition = condition
         self.body = body
@@ -159,6 +256,8 @@ class IfBlock(AST):
         return self.__str__()
 
 class ForBlock(AST):
+    __slots__ = ('count', 'body')
+
     def __init__(self, count, body):
         self.count = count
         self.body = body
@@ -173,11 +272,15 @@ class ForBlock(AST):
         return self.__str__()
 
 class WhileBlock(AST):
-    def __init__(self, left, op, right, body):
+    __slots__ = ('left', 'op', 'right', 'body', 'invariant')
+
+    def __init__(self, left, op, right, body, invariant=False):
         self.left = left
         self.op = op
         self.right = right
         self.body = body
+        # Set by the optimizer when the body cannot change the condition
+        self.invariant = invariant
     
     def __str__(self, indent=0):
         result = '  ' * indent + 'WhileBlock:\n'
@@ -191,11 +294,23 @@ class WhileBlock(AST):
     def __repr__(self):
         return self.__str__()
 
+class OpenBlock:
+    # A block whose header has been parsed and whose body is still being read
+    __slots__ = ('kind', 'start', 'indent_level', 'header', 'body')
+
+    def __init__(self, kind, start, indent_level, header):
+        self.kind = kind
+        self.start = start
+        self.indent_level = indent_level
+        self.header = header
+        self.body = []
+
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
+        # Tokens may be a list or a lazy iterator such as Lexer.scan()
+        self.tokens = iter(tokens)
         self.pos = 0
-        self.current_token = tokens[0] if tokens else None
+        self.current_token = next(self.tokens, None)
     
     def error(self):
         token = self.current_token
@@ -204,95 +319,124 @@ class Parser:
         
     def advance(self):
         self.pos += 1
-        if self.pos > len(self.tokens) - 1:
-            self.current_token = None
-        else:
-            self.current_token = self.tokens[self.pos]
+        self.current_token = next(self.tokens, None)
+
+    def locate(self, node, origin):
+        # Copies the position of a token or an already located node
+        if origin is not None:
+            node.line = origin.line
+            node.column = origin.column
+        return node
             
-    def parse_if(self):
-        left = self.term()
-        
-        if self.current_token and self.current_token.type == 'COMPARISON':
-            op = self.current_token.value
-            self.advance()
-            right = self.term()
-            condition = If(left, op, right)
-        else:
-            self.error()
-        
-        if self.current_token and self.current_token.type == 'NEWLINE':
+    def expect(self, token_type):
+        if self.current_token and self.current_token.type == token_type:
             self.advance()
         else:
             self.error()
 
+    def open_block(self, blocks, kind, start, header):
+        # A block header ends the line and the body's indent follows
+        self.expect('NEWLINE')
         if self.current_token and self.current_token.type == 'INDENT':
             indent_level = self.current_token.value
             self.advance()
         else:
             self.error()
+        blocks.append(OpenBlock(kind, start, indent_level, header))
 
-        body = []
-        while self.current_token:
-            if self.current_token.type == 'NEWLINE':
+    def close_block(self, block, blocks):
+        # The node for a block whose body has ended; None when an `otherwise`
+        # opened the else body of an `if` instead
+        if block.kind == 'if':
+            if self.current_token and self.current_token.type == 'KEYWORD' and self.current_token.value == 'else':
+                else_token = self.current_token
                 self.advance()
-                if self.current_token and self.current_token.type == 'INDENT' and self.current_token.value <= indent_level:
-                    self.advance()
-                else:
-                    break
-            else:
-                line = self.expr()
-                if line:
-                    body.append(line)
-                else:
-                    self.advance()
-
-        if self.current_token and self.current_token.type == 'KEYWORD' and self.current_token.value == 'else':
-            self.advance()
-            if self.current_token and self.current_token.type == 'NEWLINE':
-                self.advance()
-            else:
-                self.error()
+                self.open_block(blocks, 'else', block.start, (block, else_token))
+                return None
+            node = IfBlock(block.header, Statement(block.body))
+        elif block.kind == 'else':
+            if_block, else_token = block.header
+            else_body = self.locate(Else(Statement(block.body)), else_token)
+            node = IfBlock(if_block.header, Statement(if_block.body), else_body)
+        elif block.kind == 'repeat':
+            node = ForBlock(block.header, Statement(block.body))
+        else:
+            left, op, right = block.header
+            node = WhileBlock(left, op, right, Statement(block.body))
+        return self.locate(node, block.start)
 
-            if self.current_token and self.current_token.type == 'INDENT':
-                else_indent_level = self.current_token.value
+    def parse_list(self):
+        # [a, b, c] or the range [a to b]; an empty list is []
+        start = self.current_token
+        self.advance()
+        elements = []
+        if self.current_token and self.current_token.type != 'RBRACKET':
+            elements.append(self.term())
+            if self.current_token and self.current_token.type == 'IDENTIFIER' and self.current_token.value == 'to':
                 self.advance()
+                node = Range(elements[0], self.term())
             else:
-                self.error()
-
-            else_body = []
-            while self.current_token:
-                if self.current_token.type == 'NEWLINE':
+                while self.current_token and self.current_token.type == 'COMMA':
                     self.advance()
-                    if self.current_token and self.current_token.type == 'INDENT' and self.current_token.value <= else_indent_level:
-                        self.advance()
-                    else:
-                        break
-                else:
-                    line = self.expr()
-                    if line:
-                        else_body.append(line)
-                    else:
-                        self.advance()
-
-            return IfBlock(condition, Statement(body), Else(Statement(else_body)))
+                    elements.append(self.term())
+                node = ListLiteral(elements)
         else:
-            return IfBlock(condition, Statement(body))
-    
+            node = ListLiteral(elements)
+        if self.current_token and self.current_token.type == 'RBRACKET':
+            self.advance()
+        else:
+            self.error()
+        return self.locate(node, start)
+
     def parse(self):
-        statements = []
+        return Statement(list(self.statements()))
+
+    def statements(self):
+        # Yields each top-level statement, whole blocks included, as soon as it is complete
         while self.current_token:
             if self.current_token.type == 'NEWLINE':
                 self.advance()
                 continue
             stmt = self.expr()
             if stmt:
-                statements.append(stmt)
+                yield stmt
             # Skip any trailing newlines after statement
             while self.current_token and self.current_token.type == 'NEWLINE':
                 self.advance()
-        return Statement(statements)
     
     def expr(self):
+        # Parses one top-level statement, whole blocks included. The blocks
+        # being read are kept on an explicit stack instead of the call
+        # stack, so nesting depth is not limited by the recursion limit
+        blocks = []
+        node = self.statement(blocks)
+        while blocks:
+            block = blocks[-1]
+            if node is not None:
+                block.body.append(node)
+            # Moves to the next statement of the body. It ends at a line with
+            # no indent or more indent than the body's, or at the end of
+            # input; a line indented less stays in the block
+            token = self.current_token
+            while token and token.type == 'NEWLINE':
+                self.advance()
+                token = self.current_token
+                if token and token.type == 'INDENT' and token.value <= block.indent_level:
+                    self.advance()
+                    token = self.current_token
+                else:
+                    token = None
+            if token:
+                node = self.statement(blocks)
+            else:
+                blocks.pop()
+                node = self.close_block(block, blocks)
+        return node
+
+    def statement(self, blocks):
+        # Parses a simple statement, or the header of a block, which is
+        # pushed on `blocks` and gives None
+        start = self.current_token
         left = self.term()
         
         if isinstance(left, Keyword):
@@ -301,78 +445,39 @@ class Parser:
                     if self.current_token.type == 'STRING':
                         right = self.term()
                         left = Print(right)
-                    elif self.current_token.type == 'NUMBER' or self.current_token.type == 'IDENTIFIER':
+                    elif self.current_token.type in ('NUMBER', 'IDENTIFIER', 'LBRACKET'):
                         right = self.term()
                         # Add check for None before accessing type
                         if self.current_token and self.current_token.type == 'OPERATOR':
                             op = self.current_token.value
                             self.advance()
                             next_num = self.term()
-                            right = BinOp(right, op, next_num)
+                            right = self.locate(BinOp(right, op, next_num), right)
                         left = Print(right)
                 else:
                     self.error()
             elif left.value == 'if':
-                left = self.parse_if()
-            elif left.value == 'repeat':
-                count = self.term()
-                if self.current_token and self.current_token.type == 'NEWLINE':
-                    self.advance()
-                else:
-                    self.error()
-
-                if self.current_token and self.current_token.type == 'INDENT':
-                    indent_level = self.current_token.value
+                left = self.term()
+                if self.current_token and self.current_token.type == 'COMPARISON':
+                    op = self.current_token.value
                     self.advance()
+                    right = self.term()
+                    condition = self.locate(If(left, op, right), left)
                 else:
                     self.error()
-
-                body = []
-                while self.current_token:
-                    if self.current_token.type == 'NEWLINE':
-                        self.advance()
-                        if self.current_token and self.current_token.type == 'INDENT' and self.current_token.value <= indent_level:
-                            self.advance()
-                        else:
-                            break
-                    else:
-                        line = self.expr()
-                        if line:
-                            body.append(line)
-                        else:
-                            self.advance()
-                return ForBlock(count, Statement(body))
+                self.open_block(blocks, 'if', start, condition)
+                return None
+            elif left.value == 'repeat':
+                count = self.term()
+                self.open_block(blocks, 'repeat', start, count)
+                return None
             elif left.value == 'until':
                 left = self.term()
                 op = self.current_token.value
                 self.advance()
                 right = self.term()
-                if self.current_token and self.current_token.type == 'NEWLINE':
-                    self.advance()
-                else:
-                    self.error()
-
-                if self.current_token and self.current_token.type == 'INDENT':
-                    indent_level = self.current_token.value
-                    self.advance()
-                else:
-                    self.error()
-
-                body = []
-                while self.current_token:
-                    if self.current_token.type == 'NEWLINE':
-                        self.advance()
-                        if self.current_token and self.current_token.type == 'INDENT' and self.current_token.value <= indent_level:
-                            self.advance()
-                        else:
-                            break
-                    else:
-                        line = self.expr()
-                        if line:
-                            body.append(line)
-                        else:
-                            self.advance()
-                return WhileBlock(left, op, right, Statement(body))
+                self.open_block(blocks, 'until', start, (left, op, right))
+                return None
                 
         elif self.current_token:
             if self.current_token.type == 'OPERATOR':
@@ -391,13 +496,13 @@ class Parser:
                 right = self.term()
                 if isinstance(right, Keyword):
                     if right.value == 'input':
-                        right = Input(left.name)
+                        right = self.locate(Input(left.name), right)
                 if self.current_token: 
                     if self.current_token.type == 'OPERATOR':
                         op = self.current_token.value
                         self.advance()
                         next_num = self.term()
-                        right = BinOp(right, op, next_num)
+                        right = self.locate(BinOp(right, op, next_num), right)
                     elif self.current_token == 'input':
                         right = Input(left.name)
                 
@@ -407,8 +512,11 @@ class Parser:
                 if self.current_token and self.current_token.type != 'NEWLINE':
                     self.error()
         
+        if not hasattr(left, 'line'):
+            self.locate(left, start)
         return left
     
+    
     def term(self):
         if not self.current_token:
             self.error()
@@ -416,19 +524,34 @@ class Parser:
         if self.current_token.type == 'NUMBER':
             token = self.current_token
             self.advance()
-            return Number(token.value)
+            return self.locate(Number(token.value), token)
         elif self.current_token.type == 'IDENTIFIER':
             token = self.current_token
             self.advance()
-            return Variable(token.value)
+            if token.value == 'length' and self.current_token and \
+                    self.current_token.type == 'IDENTIFIER' and self.current_token.value == 'of':
+                self.advance()
+                return self.locate(Length(self.term()), token)
+            node = self.locate(Variable(token.value), token)
+            if self.current_token and self.current_token.type == 'LBRACKET':
+                self.advance()
+                index = self.term()
+                if self.current_token and self.current_token.type == 'RBRACKET':
+                    self.advance()
+                else:
+                    self.error()
+                node = self.locate(Index(node, index), token)
+            return node
+        elif self.current_token.type == 'LBRACKET':
+            return self.parse_list()
         elif self.current_token.type == 'KEYWORD':
             token = self.current_token
             self.advance()
-            return Keyword(token.value)
+            return self.locate(Keyword(token.value), token)
         elif self.current_token.type == 'STRING':
             token = self.current_token
             self.advance()
-            return String(token.value)
+            return self.locate(String(token.value), token)
         else:
             self.error()
 
@@ -0,0 +1,127 @@
+import time
+from interpreter import Interpreter, COMPARISONS
+
+class LineStats:
+    __slots__ = ('line', 'hits', 'iterations', 'self_time', 'total_time')
+
+    def __init__(self, line):
+        self.line = line
+        self.hits = 0
+        self.iterations = 0
+        self.self_time = 0.0
+        self.total_time = 0.0
+
+class ProfilingInterpreter(Interpreter):
+    # Tree-walking interpreter that times every statement by source line.
+    # Self time excludes the statements nested inside a block; cumulative
+    # time includes them. Loops run every iteration (no closed-form
+    # shortcut) so the counts describe the program as written
+    def __init__(self, ast, output=None, inputs=None):
+        super().__init__(ast, output, inputs)
+        self.stats = {}
+        # Lines of the statements currently running, outermost first, and
+        # the time spent in the children of each
+        self.stack = []
+        self.child_times = []
+        self.stacks = {}
+
+    def line_stats(self, line):
+        stats = self.stats.get(line)
+        if stats is None:
+            stats = self.stats[line] = LineStats(line)
+        return stats
+
+    def loop_plan(self, node):
+        return None
+
+    def visit_Statement(self, node):
+        for statement in node.statements:
+            self.run_statement(statement)
+
+    def run_statement(self, node):
+        line = getattr(node, 'line', None)
+        stats = self.line_stats(line)
+        stats.hits += 1
+        stack = self.stack
+        child_times = self.child_times
+        stack.append(line)
+        child_times.append(0.0)
+        start = time.perf_counter()
+        try:
+            self.visit(node)
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - child_times.pop()
+            stats.self_time += own
+            stats.total_time += elapsed
+            key = tuple(stack)
+            self.stacks[key] = self.stacks.get(key, 0.0) + own
+            stack.pop()
+            if child_times:
+                child_times[-1] += elapsed
+
+    def visit_ForBlock(self, node):
+        stats = self.line_stats(getattr(node, 'line', None))
+        count = self.visit(node.count)
+        for _ in range(int(count)):
+            stats.iterations += 1
+            self.visit(node.body)
+
+    def visit_WhileBlock(self, node):
+        stats = self.line_stats(getattr(node, 'line', None))
+        left = self.visit(node.left)
+        compare = COMPARISONS[node.op]
+        right = self.visit(node.right)
+        if node.invariant:
+            if compare(left, right):
+                return
+            while True:
+                stats.iterations += 1
+                self.visit(node.body)
+        while not compare(left, right):
+            stats.iterations += 1
+            self.visit(node.body)
+            left = self.visit(node.left)
+            right = self.visit(node.right)
+
+    def report(self, source_lines=(), limit=5):
+        # Per-line table in source order, followed by the hottest lines
+        rows = sorted(self.stats.values(), key=lambda stats: (stats.line is None, stats.line or 0))
+        total = sum(stats.self_time for stats in rows)
+        lines = [f'{"line":>6} {"hits":>10} {"iterations":>10} {"self ms":>10} {"cumul ms":>10} {"self %":>7}  source']
+        for stats in rows:
+            lines.append(self.format_row(stats, total, source_lines))
+        hottest = sorted(rows, key=lambda stats: stats.self_time, reverse=True)[:limit]
+        if hottest:
+            lines.append('')
+            lines.append(f'Hottest lines (total {total * 1000:.3f} ms):')
+            for stats in hottest:
+                lines.append(self.format_row(stats, total, source_lines))
+        return '\n'.join(lines) + '\n'
+
+    def format_row(self, stats, total, source_lines):
+        line = '?' if stats.line is None else stats.line
+        source = ''
+        if stats.line is not None and 0 < stats.line <= len(source_lines):
+            source = source_lines[stats.line - 1].rstrip()
+        iterations = stats.iterations if stats.iterations else ''
+        share = stats.self_time / total * 100 if total else 0.0
+        return (f'{line:>6} {stats.hits:>10} {iterations:>10} {stats.self_time * 1000:>10.3f} '
+                f'{stats.total_time * 1000:>10.3f} {share:>6.1f}%  {source}')
+
+    def collapsed_stacks(self, source_lines=(), root='main'):
+        # One "frame;frame;frame microseconds" line per distinct stack of
+        # source lines, the input format of flamegraph tools
+        lines = []
+        for stack, seconds in sorted(self.stacks.items(), key=lambda item: [line or 0 for line in item[0]]):
+            frames = [root]
+            for line in stack:
+                if line is None:
+                    frames.append('?')
+                    continue
+                source = ''
+                if 0 < line <= len(source_lines):
+                    source = ' ' + source_lines[line - 1].strip().replace(';', ',')
+                frames.append(f'line {line}:{source}')
+            lines.append(f'{";".join(frames)} {round(seconds * 1_000_000)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,105 @@
+import threading
+from functools import lru_cache
+from resolver import UNDEFINED
+from inputs import IterableInput
+from optimizer import Optimizer
+from main import ENGINES, parse_program
+
+COMPILE_CACHE_SIZE = 256
+
+class RunIO:
+    # Output sink and input provider of a compiled program in one; engines
+    # bind its methods once, and each run swaps in fresh buffers
+    def __init__(self):
+        self.lines = []
+        self.inputs = IterableInput(())
+
+    def reset(self, inputs=None):
+        self.lines = []
+        if inputs is None:
+            self.inputs = IterableInput(())
+        elif hasattr(inputs, 'read'):
+            self.inputs = inputs
+        else:
+            self.inputs = IterableInput(inputs)
+
+    def write(self, value):
+        self.lines.append(str(value))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read(self, name):
+        return self.inputs.read(name)
+
+class Result:
+    def __init__(self, lines, variables, error=None):
+        self.lines = lines
+        self.variables = variables
+        self.error = error
+
+    @property
+    def output(self):
+        return ''.join(f'{line}\n' for line in self.lines)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f'Result(lines={self.lines!r}, variables={self.variables!r}, error={self.error!r})'
+
+class Snapshot:
+    # Variable state captured after running a program, used as the
+    # starting point of later runs
+    def __init__(self, variables):
+        self.variables = dict(variables)
+
+    def __repr__(self):
+        return f'Snapshot({self.variables!r})'
+
+class Program:
+    def __init__(self, source, ast, engine='tree'):
+        self.source = source
+        self.io = RunIO()
+        self.interpreter = ENGINES[engine](ast, self.io, self.io)
+        self.lock = threading.Lock()
+
+    def run(self, inputs=None, variables=None, snapshot=None):
+        # Runs the compiled program from a clean state, or from a snapshot,
+        # with `variables` set on top; never prompts and never prints
+        with self.lock:
+            interpreter = self.interpreter
+            values = interpreter.slots.values
+            # In place, since compiled code holds on to this list
+            values[:] = [UNDEFINED] * len(values)
+            if snapshot is not None:
+                interpreter.variables.update(snapshot.variables)
+            if variables:
+                interpreter.variables.update(variables)
+            self.io.reset(inputs)
+            error = None
+            try:
+                interpreter.interpret()
+            except Exception as e:
+                error = str(e)
+            return Result(self.io.lines, dict(interpreter.variables), error)
+
+    def snapshot(self, inputs=None, variables=None, snapshot=None):
+        # Runs the program as a prelude and keeps the resulting state
+        result = self.run(inputs, variables, snapshot)
+        if result.error is not None:
+            raise Exception(result.error)
+        return Snapshot(result.variables)
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile(source, engine='tree', optimize=False):
+    # Lexes, parses and prepares the program once; repeated calls with the
+    # same source return the same Program from an in-process LRU cache
+    ast = parse_program(source)
+    if optimize:
+        ast = Optimizer().optimize(ast)
+    return Program(source, ast, engine)
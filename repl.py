@@ -0,0 +1,161 @@
+import sys
+from lexer import Lexer
+from parser import Parser, Statement
+from optimizer import Optimizer
+from profiler import ProfilingInterpreter
+from resolver import UNDEFINED
+from sinks import StdoutSink
+from instrument import Instrumentation
+
+try:
+    # Line editing and history where the platform has it
+    import readline
+except ImportError:
+    readline = None
+
+PROMPT = '>>> '
+CONTINUATION_PROMPT = '... '
+# Words that open a block; the entry then runs until an empty line
+BLOCK_WORDS = ('if', 'repeat', 'otherwise')
+
+HELP = '''Type statements to run them; variables are kept between entries.
+Blocks started by "if" or "repeat" end with an empty line.
+Commands:
+  :time STATEMENT     run STATEMENT and report how long each phase took
+  :profile STATEMENT  run STATEMENT with the per-line profiler
+  :vars               show the variables that are set
+  :reset              forget all variables
+  :help               show this help
+  :quit               leave (or press Ctrl+D)
+A command followed by a block header reads the block on the next lines.
+'''
+
+def opens_block(line):
+    words = line.split(None, 1)
+    return bool(words) and words[0] in BLOCK_WORDS
+
+class Repl:
+    # Interactive session on one engine instance. Each entry is lexed,
+    # parsed and compiled on its own and run against the variables left by
+    # the entries before it, so nothing already entered is processed again
+    def __init__(self, engine, optimize=False, output=None, inputs=None):
+        self.output = output if output is not None else StdoutSink()
+        self.interpreter = engine(Statement([]), self.output, inputs)
+        self.optimizer = Optimizer() if optimize else None
+
+    def compile(self, source):
+        tokens = Lexer(source).tokenize()
+        ast = Parser(tokens).parse()
+        if self.optimizer is not None:
+            ast = self.optimizer.optimize(ast)
+        return ast
+
+    def execute(self, source):
+        ast = self.compile(source)
+        try:
+            for statement in ast.statements:
+                self.interpreter.execute(statement)
+        finally:
+            self.output.flush()
+
+    def time(self, source):
+        # Reports each phase of one entry, like --timings does for a file
+        instrumentation = Instrumentation()
+        try:
+            with instrumentation.phase('compile'):
+                ast = self.compile(source)
+            instrumentation.count_nodes(ast)
+            with instrumentation.phase('execute'):
+                try:
+                    for statement in ast.statements:
+                        self.interpreter.execute(statement)
+                finally:
+                    self.output.flush()
+        finally:
+            sys.stderr.write(instrumentation.report())
+
+    def profile(self, source):
+        # Runs the entry on the profiling tree walker over the same variables
+        ast = self.compile(source)
+        profiler = ProfilingInterpreter(Statement([]), self.output, self.interpreter.inputs)
+        profiler.slots = self.interpreter.slots
+        profiler.values = self.interpreter.values
+        profiler.variables = self.interpreter.variables
+        try:
+            # As one block, so the top-level statements are timed too
+            profiler.execute(ast)
+        finally:
+            self.output.flush()
+            sys.stderr.write(profiler.report(source.split('\n')))
+
+    def reset(self):
+        values = self.interpreter.values
+        # In place, since compiled entries hold on to this list
+        values[:] = [UNDEFINED] * len(values)
+
+    def show_variables(self):
+        for name, value in self.interpreter.variables.items():
+            print(f'{name} = {value!r}')
+
+    def read_entry(self):
+        # One line, or a whole block when the line opens one. Returns None
+        # at end of input
+        try:
+            line = input(PROMPT)
+        except EOFError:
+            return None
+        # A command's statement may open a block too
+        statement = line.partition(' ')[2] if line.startswith(':') else line
+        if not opens_block(statement):
+            return line
+        lines = [line]
+        while True:
+            try:
+                line = input(CONTINUATION_PROMPT)
+            except EOFError:
+                break
+            if not line.strip():
+                break
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def handle(self, entry):
+        # Runs one entry or command; False when the session should end
+        if not entry.startswith(':'):
+            if entry.strip():
+                self.execute(entry + '\n')
+            return True
+        command, _, source = entry.partition(' ')
+        if command in (':quit', ':exit', ':q'):
+            return False
+        if command == ':help':
+            print(HELP, end='')
+        elif command == ':vars':
+            self.show_variables()
+        elif command == ':reset':
+            self.reset()
+        elif command in (':time', ':profile'):
+            if not source.strip():
+                print(f'Usage: {command} STATEMENT')
+            elif command == ':time':
+                self.time(source + '\n')
+            else:
+                self.profile(source + '\n')
+        else:
+            print(f'Unknown command {entry.split(None, 1)[0]}, type :help for help')
+        return True
+
+    def run(self):
+        print('enlang interactive session, type :help for help')
+        while True:
+            try:
+                entry = self.read_entry()
+                if entry is None:
+                    print()
+                    break
+                if not self.handle(entry):
+                    break
+            except KeyboardInterrupt:
+                print('\nInterrupted')
+            except Exception as e:
+                print(f'Error: {e}')
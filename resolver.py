@@ -0,0 +1,69 @@
+from collections.abc import MutableMapping
+from parser import AST, Variable, Assign
+
+# Marks a slot whose variable has not been assigned yet
+UNDEFINED = object()
+
+class SlotTable:
+    def __init__(self):
+        self.index = {}
+        self.names = []
+        self.values = []
+
+    def slot(self, name):
+        slot = self.index.get(name)
+        if slot is None:
+            slot = self.index[name] = len(self.values)
+            self.names.append(name)
+            self.values.append(UNDEFINED)
+        return slot
+
+class SlotView(MutableMapping):
+    # Dict-style access to the slot values, keyed by variable name
+    def __init__(self, slots):
+        self.slots = slots
+
+    def __getitem__(self, name):
+        slot = self.slots.index.get(name)
+        if slot is None or self.slots.values[slot] is UNDEFINED:
+            raise KeyError(name)
+        return self.slots.values[slot]
+
+    def __setitem__(self, name, value):
+        self.slots.values[self.slots.slot(name)] = value
+
+    def __delitem__(self, name):
+        self[name]
+        self.slots.values[self.slots.index[name]] = UNDEFINED
+
+    def __iter__(self):
+        for name, value in zip(self.slots.names, self.slots.values):
+            if value is not UNDEFINED:
+                yield name
+
+    def __len__(self):
+        return sum(1 for value in self.slots.values if value is not UNDEFINED)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class Resolver:
+    def __init__(self, slots):
+        self.slots = slots
+
+    def resolve(self, ast):
+        # Gives every Variable and Assign node the slot index of its name
+        stack = [ast]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (Variable, Assign)):
+                node.slot = self.slots.slot(node.name)
+            children = []
+            for field in type(node).__slots__:
+                child = getattr(node, field, None)
+                if isinstance(child, list):
+                    children.extend(child)
+                elif isinstance(child, AST):
+                    children.append(child)
+            stack.extend(reversed(children))
+        return ast
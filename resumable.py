@@ -0,0 +1,127 @@
+import time
+from interpreter import Interpreter, COMPARISONS
+from parser import Statement, Else, IfBlock, ForBlock, WhileBlock
+
+# Steps run between two looks at the clock when a time limit is set
+TICK = 1000
+
+class ResumableInterpreter(Interpreter):
+    # Tree-walking interpreter that can stop after a number of steps or an
+    # amount of time and carry on later. Blocks and loops are walked by
+    # generators that yield when the current slice of steps runs out; simple
+    # statements and expressions use the normal visitors. Every top-level or
+    # nested statement and every loop iteration counts as one step
+    def __init__(self, ast, output=None, inputs=None):
+        super().__init__(ast, output, inputs)
+        self.walkers = {
+            Statement: self.walk_Statement,
+            Else: self.walk_Else,
+            IfBlock: self.walk_IfBlock,
+            ForBlock: self.walk_ForBlock,
+            WhileBlock: self.walk_WhileBlock,
+        }
+        self.runner = None
+        self.countdown = 0
+        self.steps = 0
+        self.finished = False
+
+    def interpret(self):
+        self.resume()
+
+    def resume(self, steps=None, seconds=None):
+        # Runs until the program ends (True) or until `steps` more steps or
+        # `seconds` of wall time have passed (False)
+        if self.finished:
+            return True
+        if self.runner is None:
+            self.runner = self.walk(self.ast)
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        remaining = steps
+        try:
+            while remaining is None or remaining > 0:
+                if remaining is None:
+                    tick = TICK
+                elif deadline is None:
+                    tick = remaining
+                else:
+                    tick = min(TICK, remaining)
+                self.countdown = tick
+                try:
+                    next(self.runner)
+                except StopIteration:
+                    self.finished = True
+                    return True
+                finally:
+                    self.steps += tick - self.countdown
+                if remaining is not None:
+                    remaining -= tick
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+            return False
+        except Exception:
+            self.finished = True
+            raise
+        finally:
+            self.output.flush()
+
+    def walk(self, node):
+        walker = self.walkers.get(type(node))
+        if walker is None:
+            self.visit(node)
+        else:
+            yield from walker(node)
+
+    def walk_Statement(self, node):
+        walkers = self.walkers
+        for statement in node.statements:
+            walker = walkers.get(type(statement))
+            if walker is None:
+                self.visit(statement)
+            else:
+                yield from walker(statement)
+            self.countdown -= 1
+            if not self.countdown:
+                yield
+
+    def walk_Else(self, node):
+        yield from self.walk(node.body)
+
+    def walk_IfBlock(self, node):
+        if self.visit(node.condition):
+            yield from self.walk(node.body)
+        elif node.else_body:
+            yield from self.walk(node.else_body)
+
+    def walk_ForBlock(self, node):
+        count = self.visit(node.count)
+        for _ in range(int(count)):
+            yield from self.walk(node.body)
+            self.countdown -= 1
+            if not self.countdown:
+                yield
+
+    def walk_WhileBlock(self, node):
+        # A loop solved in closed form is one step; the tight-loop fallback
+        # could not be interrupted, so everything else is walked
+        plan = self.loop_plan(node)
+        if plan is not None and plan.run_closed_form():
+            return
+
+        left = self.visit(node.left)
+        compare = COMPARISONS[node.op]
+        right = self.visit(node.right)
+        if node.invariant:
+            if compare(left, right):
+                return
+            while True:
+                yield from self.walk(node.body)
+                self.countdown -= 1
+                if not self.countdown:
+                    yield
+        while not compare(left, right):
+            yield from self.walk(node.body)
+            self.countdown -= 1
+            if not self.countdown:
+                yield
+            left = self.visit(node.left)
+            right = self.visit(node.right)
@@ -0,0 +1,92 @@
+import time
+import heapq
+import itertools
+from resumable import ResumableInterpreter
+from sinks import ListSink
+from inputs import IterableInput
+
+# Wall time each program may run before the next one gets a turn
+DEFAULT_QUANTUM = 0.005
+
+class Task:
+    def __init__(self, name, interpreter, cpu_budget=None):
+        self.name = name
+        self.interpreter = interpreter
+        self.cpu_budget = cpu_budget
+        self.cpu_time = 0.0
+        self.virtual_time = 0.0
+        self.status = 'ready'
+        self.error = None
+
+    @property
+    def steps(self):
+        return self.interpreter.steps
+
+    @property
+    def output(self):
+        return self.interpreter.output
+
+    def __repr__(self):
+        return f'Task({self.name!r}, status={self.status!r}, steps={self.steps}, cpu_time={self.cpu_time:.6f})'
+
+class Scheduler:
+    # Time-slices many programs on one thread. The next turn always goes to
+    # the program that has used the least CPU time so far (fair queuing), and
+    # a program that spends its whole CPU budget is stopped
+    def __init__(self, quantum=DEFAULT_QUANTUM, quantum_steps=None):
+        self.quantum = quantum
+        self.quantum_steps = quantum_steps
+        self.queue = []
+        self.order = itertools.count()
+        self.clock = 0.0
+        self.tasks = []
+
+    def add(self, name, ast, output=None, inputs=None, cpu_budget=None):
+        # Programs never prompt here; by default their output is captured
+        if output is None:
+            output = ListSink()
+        if inputs is None:
+            inputs = IterableInput(())
+        task = Task(name, ResumableInterpreter(ast, output, inputs), cpu_budget)
+        # Newcomers start level with the programs already running instead
+        # of being owed all the time those have used
+        task.virtual_time = self.clock
+        self.tasks.append(task)
+        heapq.heappush(self.queue, (task.virtual_time, next(self.order), task))
+        return task
+
+    def step(self):
+        # Gives one program one turn; False once every program has stopped
+        if not self.queue:
+            return False
+        _, _, task = heapq.heappop(self.queue)
+        self.clock = task.virtual_time
+
+        quantum = self.quantum
+        if task.cpu_budget is not None and quantum is not None:
+            quantum = min(quantum, task.cpu_budget - task.cpu_time)
+        task.status = 'running'
+        start = time.process_time()
+        try:
+            finished = task.interpreter.resume(self.quantum_steps, quantum)
+        except Exception as e:
+            finished = True
+            task.error = str(e)
+        used = time.process_time() - start
+        task.cpu_time += used
+        task.virtual_time += used
+
+        if finished:
+            task.status = 'done' if task.error is None else 'error'
+        elif task.cpu_budget is not None and task.cpu_time >= task.cpu_budget:
+            task.status = 'budget'
+            task.error = f'CPU budget of {task.cpu_budget} seconds used up'
+        else:
+            task.status = 'ready'
+            heapq.heappush(self.queue, (task.virtual_time, next(self.order), task))
+        return True
+
+    def run(self):
+        while self.step():
+            pass
+        return self.tasks
@@ -0,0 +1,84 @@
+import sys
+import os
+import asyncio
+import argparse
+from main import parse_program
+from optimizer import Optimizer
+from aio import run_session
+from sinks import DEFAULT_BUFFER_SIZE
+
+DEFAULT_PORT = 7878
+DEFAULT_BACKLOG = 1024
+
+def parse_args(argv):
+    arg_parser = argparse.ArgumentParser(usage='python server.py [options] <filename.enl>')
+    arg_parser.add_argument('filename')
+    arg_parser.add_argument('--host', default='127.0.0.1',
+                            help='address to listen on (default: 127.0.0.1)')
+    arg_parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                            help=f'TCP port to listen on (default: {DEFAULT_PORT})')
+    arg_parser.add_argument('--unix', metavar='PATH',
+                            help='listen on a Unix socket at PATH instead of TCP')
+    arg_parser.add_argument('--no-prompt', action='store_true',
+                            help='do not send "Input value for ..." prompts to clients')
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help='fold constants and remove dead branches before serving')
+    arg_parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE,
+                            help='characters of output to collect before sending them')
+    return arg_parser.parse_args(argv)
+
+async def start_server(ast, host='127.0.0.1', port=DEFAULT_PORT, unix=None, prompt=True,
+                       buffer_size=DEFAULT_BUFFER_SIZE):
+    # Every connection gets a fresh session of the same parsed program
+    async def handle(reader, writer):
+        try:
+            await run_session(ast, reader, writer, prompt, buffer_size)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    if unix:
+        return await asyncio.start_unix_server(handle, path=unix, backlog=DEFAULT_BACKLOG)
+    return await asyncio.start_server(handle, host, port, backlog=DEFAULT_BACKLOG)
+
+async def serve(args, ast):
+    server = await start_server(ast, args.host, args.port, args.unix,
+                                not args.no_prompt, args.buffer_size)
+    where = args.unix or f'{args.host}:{args.port}'
+    print(f"Serving {args.filename} on {where}...")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    args = parse_args(sys.argv[1:])
+
+    filename = args.filename
+    if not filename.endswith('.enl'):
+        print("Error: File must have .enl extension")
+        sys.exit(1)
+
+    if not os.path.exists(filename):
+        print(f"Error: File '{filename}' not found")
+        sys.exit(1)
+
+    try:
+        with open(filename, 'r') as file:
+            ast = parse_program(file.read())
+        if args.optimize:
+            ast = Optimizer().optimize(ast)
+    except Exception as e:
+        print(f"Error processing file: {str(e)}")
+        sys.exit(1)
+
+    try:
+        asyncio.run(serve(args, ast))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
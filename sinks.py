@@ -0,0 +1,94 @@
+import io
+import sys
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+class StreamSink:
+    # Collects `output` lines and writes them to a text stream in large
+    # chunks: once buffer_size characters are pending, or on every line
+    # when line_buffered is set
+    def __init__(self, stream, buffer_size=DEFAULT_BUFFER_SIZE, line_buffered=False):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.line_buffered = line_buffered or buffer_size <= 0
+        self.parts = []
+        self.size = 0
+
+    def target(self):
+        return self.stream
+
+    def write(self, value):
+        text = f'{value}\n'
+        self.parts.append(text)
+        self.size += len(text)
+        if self.line_buffered or self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            stream = self.target()
+            stream.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+            stream.flush()
+
+    def close(self):
+        self.flush()
+
+class StdoutSink(StreamSink):
+    # Writes to whatever sys.stdout is at flush time, so redirection still
+    # works; line buffered by default when stdout is a terminal
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, line_buffered=None):
+        if line_buffered is None:
+            try:
+                line_buffered = sys.stdout.isatty()
+            except (AttributeError, ValueError):
+                line_buffered = False
+        super().__init__(None, buffer_size, line_buffered)
+
+    def target(self):
+        return sys.stdout
+
+class FileSink(StreamSink):
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE, line_buffered=False, mode='w'):
+        super().__init__(open(path, mode, encoding='utf-8'), buffer_size, line_buffered)
+        self.path = path
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.stream.close()
+
+class ListSink:
+    # Keeps each output line, without the newline, for embedding
+    def __init__(self):
+        self.lines = []
+
+    def write(self, value):
+        self.lines.append(str(value))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(f'{line}\n' for line in self.lines)
+
+class StringSink:
+    def __init__(self, buffer=None):
+        self.buffer = buffer if buffer is not None else io.StringIO()
+
+    def write(self, value):
+        self.buffer.write(f'{value}\n')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return self.buffer.getvalue()
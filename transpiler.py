@@ -0,0 +1,228 @@
+from interpreter import Interpreter
+from closures import ClosureCompiler
+from parser import Number, String
+from lists import make_list, number_range, item, length
+
+PYTHON_OPERATORS = {
+    '+': '+',
+    '-': '-',
+    '*': '*',
+    '/': '/',
+}
+
+PYTHON_COMPARISONS = {
+    '=': '==',
+    '==': '==',
+    '!=': '!=',
+    '>': '>',
+    '<': '<',
+    '>=': '>=',
+    '<=': '<=',
+}
+
+def _undefined(error):
+    raise Exception(f'Runtime Error: Variable "{error.args[0]}" is not defined') from None
+
+def _invalid(left, op, right):
+    raise Exception(f'Runtime Error: Invalid operation {left} {op} {right}') from None
+
+def _division_by_zero():
+    raise Exception('Runtime Error: Division by zero')
+
+def _unsupported(name):
+    raise Exception(f'Runtime Error: Unsupported operation {name}')
+
+RUNTIME = {
+    '_undefined': _undefined,
+    '_invalid': _invalid,
+    '_division_by_zero': _division_by_zero,
+    '_unsupported': _unsupported,
+    '_list': make_list,
+    '_range': number_range,
+    '_item': item,
+    '_length': length,
+}
+
+class Transpiler:
+    def __init__(self, ast):
+        self.ast = ast
+        self.lines = []
+        self.level = 0
+        self.temporaries = 0
+
+    def transpile(self):
+        self.lines = ['def __enlang_main__(V):']
+        self.level = 1
+        self.emit('try:')
+        self.level += 1
+        self.emit_block(self.ast)
+        self.level -= 1
+        self.emit('except KeyError as error:')
+        self.emit('    _undefined(error)')
+        return '\n'.join(self.lines) + '\n'
+
+    def emit(self, line):
+        self.lines.append('    ' * self.level + line)
+
+    def temporary(self):
+        self.temporaries += 1
+        return f'_t{self.temporaries}'
+
+    def emit_block(self, node):
+        start = len(self.lines)
+        self.visit(node)
+        if len(self.lines) == start:
+            self.emit('pass')
+
+    def visit(self, node):
+        method_name = f'visit_{type(node).__name__}'
+        visitor = getattr(self, method_name, self.visit_unknown)
+        return visitor(node)
+
+    def visit_unknown(self, node):
+        self.emit(f'_unsupported({type(node).__name__!r})')
+        return 'None'
+
+    def visit_Statement(self, node):
+        for statement in node.statements:
+            expr = self.visit(statement)
+            if expr is not None:
+                # A bare expression still runs for its lookups and checks
+                self.emit(expr)
+
+    def visit_Number(self, node):
+        return repr(node.value)
+
+    def visit_String(self, node):
+        return repr(node.value)
+
+    def visit_Variable(self, node):
+        return f'V[{node.name!r}]'
+
+    def operand(self, node):
+        if isinstance(node, (Number, String)):
+            return self.visit(node)
+        name = self.temporary()
+        self.emit(f'{name} = {self.visit(node)}')
+        return name
+
+    def visit_BinOp(self, node):
+        left = self.operand(node.left)
+        right = self.operand(node.right)
+        result = self.temporary()
+        if node.op == '/':
+            if not isinstance(node.right, (Number, String)):
+                self.emit(f'if {right} == 0:')
+                self.emit('    _division_by_zero()')
+            elif node.right.value == 0:
+                self.emit('_division_by_zero()')
+        self.emit('try:')
+        self.emit(f'    {result} = {left} {PYTHON_OPERATORS[node.op]} {right}')
+        self.emit('except TypeError:')
+        self.emit(f'    _invalid({left}, {node.op!r}, {right})')
+        return result
+
+    def visit_ListLiteral(self, node):
+        elements = [self.operand(element) for element in node.elements]
+        return f'_list([{", ".join(elements)}])'
+
+    def visit_Range(self, node):
+        start = self.operand(node.start)
+        end = self.operand(node.end)
+        return f'_range({start}, {end})'
+
+    def visit_Index(self, node):
+        value = self.operand(node.value)
+        index = self.operand(node.index)
+        return f'_item({value}, {index})'
+
+    def visit_Length(self, node):
+        return f'_length({self.operand(node.value)})'
+
+    def visit_Input(self, node):
+        return f'_read({node.var_name!r})'
+
+    def visit_Assign(self, node):
+        value = self.visit(node.value)
+        self.emit(f'V[{node.name!r}] = {value}')
+
+    def visit_Print(self, node):
+        self.emit(f'_write({self.visit(node.value)})')
+
+    def visit_If(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        return f'{left} {PYTHON_COMPARISONS[node.op]} {right}'
+
+    def visit_Else(self, node):
+        self.visit(node.body)
+
+    def visit_IfBlock(self, node):
+        self.emit(f'if {self.visit(node.condition)}:')
+        self.level += 1
+        self.emit_block(node.body)
+        self.level -= 1
+        if node.else_body:
+            self.emit('else:')
+            self.level += 1
+            self.emit_block(node.else_body)
+            self.level -= 1
+
+    def visit_ForBlock(self, node):
+        self.emit(f'for _ in range(int({self.visit(node.count)})):')
+        self.level += 1
+        self.emit_block(node.body)
+        self.level -= 1
+
+    def visit_WhileBlock(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        condition = f'{left} {PYTHON_COMPARISONS[node.op]} {right}'
+        if node.invariant:
+            self.emit(f'if not ({condition}):')
+            self.level += 1
+            self.emit('while True:')
+        else:
+            self.emit(f'while not ({condition}):')
+        self.level += 1
+        self.emit_block(node.body)
+        self.level -= 1
+        if node.invariant:
+            self.level -= 1
+
+class PythonInterpreter(Interpreter):
+    def __init__(self, ast, output=None, inputs=None):
+        super().__init__(ast, output, inputs)
+        self.program = self.compile_program(ast)
+
+    def compile_program(self, ast):
+        self.source = Transpiler(ast).transpile()
+        try:
+            code = compile(self.source, '<enlang>', 'exec')
+        except (SyntaxError, RecursionError):
+            # CPython caps statically nested blocks, so very deep programs
+            # run on the closure engine instead
+            return ClosureCompiler(self.slots, self.output, self.inputs).compile(ast)
+        namespace = dict(RUNTIME)
+        namespace['_write'] = self.output.write
+        namespace['_read'] = self.inputs.read
+        exec(code, namespace)
+        main = namespace['__enlang_main__']
+        return lambda: self.run_compiled(main)
+
+    def run_compiled(self, main):
+        # Generated code keeps variables in a plain dict for fast subscripts
+        variables = dict(self.variables)
+        try:
+            main(variables)
+        finally:
+            self.variables.update(variables)
+
+    def interpret(self):
+        try:
+            return self.program()
+        finally:
+            self.output.flush()
+
+    def execute(self, node):
+        return self.compile_program(node)()